@@ -34,9 +34,11 @@ setup(name='sufriblib',
       zip_safe=False,
       install_requires=install_requires,
       tests_require=tests_require,
-      extras_require={'test': tests_require},
+      extras_require={'test': tests_require,
+                      'numpy': ['numpy']},
       entry_points={
           'console_scripts': [
             'sufribcat=sufriblib.scripts:sufribcat',
+            'sufribbench=sufriblib.scripts:sufribbench',
           ]},
       )
@@ -0,0 +1,201 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of parsers.parse(), on the files in data/ and on copies of
+them scaled up by repeating their lines. Run with the sufribbench
+script, which prints one JSON object per file and scale, so that the
+results of two commits can be compared.
+
+Each file is measured in a fresh Python process, so that its peak
+memory use isn't hidden by that of the files before it."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from . import parsers
+from . import sufrib
+
+DATA_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+SCALES = (1, 10, 100)
+
+
+def data_files(directory=DATA_DIRECTORY):
+    """Return the paths of the RIB and RMB files in directory."""
+    paths = (os.path.join(directory, filename)
+             for filename in os.listdir(directory)
+             if filename.lower().endswith(('.rib', '.rmb')))
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def scaled_copy(path, scale, directory):
+    """Write a file to directory that has the lines of the file at path
+    scale times, and return its path. It has the same extension."""
+    with open(path, 'rb') as sufribfile:
+        data = sufribfile.read()
+    if data and not data.endswith((b'\n', b'\r')):
+        data += b'\r\n'
+
+    scaled_path = os.path.join(directory, "x{0}_{1}".format(
+            scale, os.path.basename(path)))
+    with open(scaled_path, 'wb') as scaled_file:
+        for _ in range(scale):
+            scaled_file.write(data)
+    return scaled_path
+
+
+def run(paths, scales=SCALES, repeat=1):
+    """Yield the result of measure() for every path and scale, with the
+    file's name and the scale added. Every measurement is done in a
+    separate process."""
+    directory = tempfile.mkdtemp()
+    try:
+        for path in paths:
+            for scale in scales:
+                if scale == 1:
+                    case_path = path
+                else:
+                    case_path = scaled_copy(path, scale, directory)
+
+                output = subprocess.check_output([
+                        sys.executable, '-m', 'sufriblib.benchmark',
+                        case_path, str(repeat)])
+                result = json.loads(output.decode('utf8'))
+                result['file'] = os.path.basename(path)
+                result['scale'] = scale
+                yield result
+
+                if case_path != path:
+                    os.remove(case_path)
+    finally:
+        shutil.rmtree(directory)
+
+
+def measure(path, repeat=1):
+    """Benchmark parsing the file at path in this process. Returns a
+    dictionary:
+
+    - bytes, lines, records (lines that were kept), errors
+    - seconds: best time of repeat parses, and lines_per_second
+    - record_types: per record type, its number of lines and the lines
+      per second that SUFRIB21.add_line() manages for them
+    - peak_memory: the most memory (resident set size, in bytes) the
+      process used more than before the first parse
+    - bytes_per_record: the memory still used after the first parse,
+      divided by the number of records
+
+    Memory figures are None if they can't be measured on this
+    platform."""
+    gc.collect()
+    peak_before = _peak_memory()
+    memory_before = _current_memory()
+
+    errors = []
+    sufribobject = parsers.parse_collecting_errors(errors, path)
+
+    gc.collect()
+    memory_after = _current_memory()
+    peak_after = _peak_memory()
+
+    records = len(sufribobject.lines) if sufribobject is not None else 0
+    result = {
+        'bytes': os.path.getsize(path),
+        'records': records,
+        'errors': len(errors),
+        'peak_memory': _difference(peak_after, peak_before),
+        'bytes_per_record': None,
+        'python': platform.python_version(),
+        }
+    retained = _difference(memory_after, memory_before)
+    if retained is not None and records:
+        result['bytes_per_record'] = retained / records
+    del sufribobject
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.time()
+        parsers.parse_collecting_errors([], path)
+        seconds.append(time.time() - start)
+
+    lines_by_type = {}
+    line_count = 0
+    for line_number, line in parsers.enumerate_file(path):
+        record_type = line.partition('|')[0].strip()
+        lines_by_type.setdefault(record_type, []).append((line_number, line))
+        line_count += 1
+
+    result['lines'] = line_count
+    result['seconds'] = min(seconds)
+    result['lines_per_second'] = _rate(line_count, min(seconds))
+    result['record_types'] = dict(
+        (record_type, _measure_lines(lines))
+        for record_type, lines in lines_by_type.items())
+    return result
+
+
+def _measure_lines(lines):
+    """Time adding already read lines to a SUFRIB21 object."""
+    sufribobject = sufrib.SUFRIB21()
+    errors = []
+    start = time.time()
+    for line_number, line in lines:
+        sufribobject.add_line(line_number, line, errors)
+    seconds = time.time() - start
+    return {
+        'lines': len(lines),
+        'lines_per_second': _rate(len(lines), seconds),
+        }
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else None
+
+
+def _difference(after, before):
+    if after is None or before is None:
+        return None
+    return after - before
+
+
+def _peak_memory():
+    """Peak resident set size of this process in bytes, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes, except on OS X
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _current_memory():
+    """Current resident set size of this process in bytes, or None. Only
+    works where there is a /proc/self/statm (Linux)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+    except (EnvironmentError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf(str('SC_PAGE_SIZE'))
+
+
+if __name__ == '__main__':
+    # Used by run(): measure a single file, print the result as JSON
+    print(json.dumps(measure(sys.argv[1], int(sys.argv[2]))))
@@ -0,0 +1,172 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""On-disk cache of parse results, see parsers.parse()."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import hashlib
+import os
+import tempfile
+import zlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from . import sufrib
+
+
+def _format():
+    """Cache entries made with other line classes can't be used. Not
+    computed once at import, as line classes can be replaced in
+    SUFRIB21.LINE_CLASSES."""
+    return hashlib.sha1(repr(sorted(
+                (record_type, line_class.__module__, line_class.__name__,
+                 line_class.FIELDS)
+                for record_type, line_class
+                in sufrib.SUFRIB21.LINE_CLASSES.items())).encode('utf8')
+                        ).hexdigest()
+
+
+class ParseCache(object):
+    """Keeps the results of parse() (the parsed object and the errors) in
+    a directory, one compressed pickle per parsed file.
+
+    An entry is only used if the file still has the same size and
+    modification time, or, with check_content=True, the same SHA-1 of
+    its contents. If the entries together take more than max_size bytes,
+    the least recently used ones are removed."""
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024,
+                 check_content=False):
+        self.directory = directory
+        self.max_size = max_size
+        self.check_content = check_content
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _entry_path(self, path, columnar, lazy):
+        key = "{0}|{1}|{2}".format(os.path.abspath(path), columnar, lazy)
+        return os.path.join(
+            self.directory,
+            hashlib.sha1(key.encode('utf8')).hexdigest() + '.cache')
+
+    def _signature(self, path):
+        """What must be unchanged about the file for an entry to be
+        valid. May raise EnvironmentError."""
+        stat = os.stat(path)
+        signature = (_format(), stat.st_size, stat.st_mtime)
+        if self.check_content:
+            digest = hashlib.sha1()
+            with open(path, 'rb') as sufribfile:
+                for block in iter(lambda: sufribfile.read(1 << 20), b''):
+                    digest.update(block)
+            signature += (digest.hexdigest(),)
+        return signature
+
+    def get(self, path, columnar=False, lazy=False):
+        """Return the cached (sufribobject, errors) for this file, or None
+        if there is no valid entry."""
+        entry_path = self._entry_path(path, columnar, lazy)
+        try:
+            signature = self._signature(path)
+            with open(entry_path, 'rb') as entry:
+                entry_signature = pickle.load(entry)
+                if entry_signature != signature:
+                    result = None
+                else:
+                    result = pickle.loads(zlib.decompress(entry.read()))
+        except (EnvironmentError, EOFError, ValueError,
+                pickle.UnpicklingError, zlib.error):
+            return None
+
+        if result is None:
+            self._remove(entry_path)  # Outdated
+        else:
+            self._touch(entry_path)
+        return result
+
+    def put(self, path, columnar, result, lazy=False):
+        """Store result, a (sufribobject, errors) tuple, for this file."""
+        try:
+            signature = self._signature(path)
+        except EnvironmentError:
+            return
+
+        if result[0] is not None and not result[0].lazy:
+            _share_values(result[0])
+
+        # Write to a temporary file first, so that readers never see a
+        # half written entry
+        handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as entry:
+                pickle.dump(signature, entry, pickle.HIGHEST_PROTOCOL)
+                entry.write(zlib.compress(
+                        pickle.dumps(result, pickle.HIGHEST_PROTOCOL), 1))
+            entry_path = self._entry_path(path, columnar, lazy)
+            if os.name == 'nt':
+                self._remove(entry_path)  # Rename doesn't replace there
+            os.rename(temp_path, entry_path)
+        except EnvironmentError:
+            self._remove(temp_path)
+            return
+
+        self._evict()
+
+    def clear(self):
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.cache'):
+                self._remove(os.path.join(self.directory, filename))
+
+    def _evict(self):
+        """Remove the least recently used entries until the total size is
+        at most max_size."""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.cache'):
+                continue
+            entry_path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(entry_path)
+            except EnvironmentError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        total_size = sum(size for (_, size, _) in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self._remove(entry_path)
+            total_size -= size
+
+    def _touch(self, entry_path):
+        # The modification time of an entry is its last use
+        try:
+            os.utime(entry_path, None)
+        except EnvironmentError:
+            pass
+
+    def _remove(self, entry_path):
+        try:
+            os.remove(entry_path)
+        except EnvironmentError:
+            pass
+
+
+def _share_values(sufribobject):
+    """Make equal field values of the lines the same object. They are
+    then pickled only once, and after unpickling take less memory."""
+    shared = {}
+    for line in sufribobject.lines:
+        line._set_values(tuple(
+                # The type is part of the key, so that 1.0 doesn't become 1
+                shared.setdefault((type(value), value), value)
+                for value in line._get_values(line)))
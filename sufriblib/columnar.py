@@ -0,0 +1,359 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Columnar (NumPy) storage of RMB measurement data.
+
+Instead of one MrioLine object per *MRIO line, MrioColumns keeps the
+fields that are used for analysis in flat arrays, filled directly while
+parsing. RecordTable does the same for the lines of a RIB file, per
+record type. Needs numpy, which is an optional dependency of sufriblib."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import array
+import collections
+
+import numpy as np
+
+from . import sufrib
+
+# Per-sewer views on the columns of a MrioColumns object
+SewerMeasurements = collections.namedtuple(
+    "SewerMeasurements", "line_number distance measurement direction")
+
+# Indexes of the fields we need in MrioLine.FIELDS
+_FIELD_NAMES = [fieldname for (fieldname, _, _) in sufrib.MrioLine.FIELDS]
+ZYA = _FIELD_NAMES.index('ZYA')
+ZYB = _FIELD_NAMES.index('ZYB')
+ZYE = _FIELD_NAMES.index('ZYE')
+ZYT = _FIELD_NAMES.index('ZYT')
+ZYU = _FIELD_NAMES.index('ZYU')
+
+
+COLUMNS = (
+    'line_number', 'distance', 'measurement', 'direction', 'sewer_code')
+
+
+class MrioColumns(object):
+    """The *MRIO lines of an RMB file, as NumPy arrays.
+
+    - line_number: line number of each measurement
+    - distance: ZYA, as float
+    - measurement: ZYT * 10 ** ZYU, as float (like MrioLine.measurement)
+    - direction: ZYB, 1 or 2
+    - sewer_code: index into sewer_ids (ZYE, stripped)
+
+    Measurements of the same sewer are kept together. This is normally
+    already the case in the file, then the arrays are in file order;
+    otherwise they are reordered once (stably) when the arrays are
+    built, so that sewer() can return slices without copying."""
+
+    def __init__(self):
+        self.sewer_ids = []
+        self._sewer_codes = {}
+
+        self._line_number = array.array(str('l'))
+        self._distance = array.array(str('d'))
+        self._measurement = array.array(str('d'))
+        self._direction = array.array(str('b'))
+        self._sewer_code = array.array(str('l'))
+
+        self._match = sufrib.line_regex(sufrib.MrioLine.FIELDS).match
+        self._arrays = None
+
+    @classmethod
+    def from_lines(cls, lines):
+        """Return a MrioColumns with the measurements of already parsed
+        MrioLine objects."""
+        columns = cls()
+        for line in lines:
+            columns._append(line.line_number, line.sewer_id, line.distance,
+                            line.measurement, line.ZYB)
+        return columns
+
+    def __getstate__(self):
+        # The compiled regex's match method can't be pickled, and the
+        # NumPy arrays can be rebuilt.
+        state = self.__dict__.copy()
+        del state['_match']
+        state['_arrays'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._match = sufrib.line_regex(sufrib.MrioLine.FIELDS).match
+
+    def __len__(self):
+        return len(self._line_number)
+
+    def add_line(self, line_number, line, errorlist):
+        """Add a *MRIO line, appending errors to errorlist if it isn't
+        correct. Correct lines don't result in a MrioLine object; for
+        others, one is made to report exactly the same errors."""
+        match = self._match(line)
+        if match is not None:
+            fields = match.groups()
+            sewer_id = fields[ZYE].strip()
+            direction = fields[ZYB]
+            if sewer_id and direction in ('1', '2'):
+                try:
+                    distance = float(fields[ZYA])
+                    value = float(fields[ZYT])
+                    exponent = (None if fields[ZYU].isspace()
+                                else int(fields[ZYU]))
+                except ValueError:
+                    pass  # Let MrioLine report it
+                else:
+                    if exponent is not None:
+                        value *= 10 ** exponent
+                    self._append(
+                        line_number, sewer_id, distance, value, direction)
+                    return
+
+        line_instance = sufrib.MrioLine()
+        line_errors = line_instance.parse(line_number, line)
+        if line_errors:
+            errorlist += line_errors
+        else:
+            self._append(
+                line_number, line_instance.sewer_id,
+                line_instance.distance, line_instance.measurement,
+                line_instance.ZYB)
+
+    def extend(self, other):
+        """Add the measurements of another MrioColumns object."""
+        if not len(other):
+            return
+        codes = np.array(
+            [self._sewer_code_of(sewer_id) for sewer_id in other.sewer_ids],
+            dtype=self._sewer_code.typecode)
+        self._line_number.extend(other._line_number)
+        self._distance.extend(other._distance)
+        self._measurement.extend(other._measurement)
+        self._direction.extend(other._direction)
+        self._sewer_code.extend(codes[
+                np.frombuffer(other._sewer_code,
+                              dtype=other._sewer_code.typecode)].tolist())
+        self._arrays = None
+
+    def _sewer_code_of(self, sewer_id):
+        sewer_code = self._sewer_codes.get(sewer_id)
+        if sewer_code is None:
+            sewer_code = self._sewer_codes[sewer_id] = len(self.sewer_ids)
+            self.sewer_ids.append(sewer_id)
+        return sewer_code
+
+    def _append(self, line_number, sewer_id, distance, measurement,
+                direction):
+        self._line_number.append(line_number)
+        self._distance.append(distance)
+        self._measurement.append(measurement)
+        self._direction.append(int(direction))
+        self._sewer_code.append(self._sewer_code_of(sewer_id))
+        self._arrays = None
+
+    def _build(self):
+        """Turn the arrays we filled into NumPy arrays, grouped per
+        sewer, and compute where each sewer starts."""
+        columns = {}
+        for name in COLUMNS:
+            column = getattr(self, '_' + name)
+            # Copy, so that adding lines later can't invalidate the
+            # arrays. frombuffer doesn't accept empty buffers.
+            columns[name] = (
+                np.frombuffer(column, dtype=column.typecode).copy()
+                if column else np.zeros(0, dtype=column.typecode))
+
+        # Sewer codes are given out in order of first appearance, so if
+        # every sewer's measurements are contiguous, they don't decrease.
+        if np.any(np.diff(columns['sewer_code']) < 0):
+            order = np.argsort(columns['sewer_code'], kind='mergesort')
+            for name in COLUMNS:
+                columns[name] = columns[name][order]
+
+        columns['starts'] = np.searchsorted(
+            columns['sewer_code'], np.arange(len(self.sewer_ids) + 1))
+        self._arrays = columns
+        return columns
+
+    def _column(self, name):
+        arrays = self._arrays
+        if arrays is None:
+            arrays = self._build()
+        return arrays[name]
+
+    @property
+    def line_number(self):
+        return self._column('line_number')
+
+    @property
+    def distance(self):
+        return self._column('distance')
+
+    @property
+    def measurement(self):
+        return self._column('measurement')
+
+    @property
+    def direction(self):
+        return self._column('direction')
+
+    @property
+    def sewer_code(self):
+        return self._column('sewer_code')
+
+    def sewer_slice(self, sewer_id):
+        """Return the slice of the arrays that holds the measurements of
+        this sewer. Raises KeyError for unknown sewer ids."""
+        code = self._sewer_codes[sewer_id]
+        starts = self._column('starts')
+        return slice(starts[code], starts[code + 1])
+
+    def sewer(self, sewer_id):
+        """Return a SewerMeasurements of views (not copies) on the
+        arrays, for the given sewer."""
+        where = self.sewer_slice(sewer_id)
+        return SewerMeasurements(
+            line_number=self.line_number[where],
+            distance=self.distance[where],
+            measurement=self.measurement[where],
+            direction=self.direction[where])
+
+
+class RecordTable(object):
+    """The lines of one record type of a RIB file (see RIB21.table()) as
+    one NumPy array per field:
+
+    - text fields (without a format) are dictionary encoded: the field's
+      distinct values, as they are in the file, are categories(fieldname),
+      and codes(fieldname) holds for every line the index of its value in
+      those, or -1 if the field is blank. Codes are of the smallest
+      integer type that fits, so a field that has only a few different
+      values takes a byte per line.
+    - 'float' and 'int' fields are float arrays, NaN if blank
+    - coordinate fields are arrays of shape (lines, 2), NaN if blank
+
+    Text values are compared and grouped without their surrounding
+    spaces, see mask() and counts()."""
+
+    def __init__(self, line_class, lines):
+        self.line_class = line_class
+        rows = [line._get_values(line) for line in lines]
+        columns = list(zip(*rows)) or [()] * (len(line_class.FIELDS) + 1)
+        self.line_number = np.array(columns[0], dtype=np.int64)
+
+        self._columns = {}
+        self._categories = {}
+        for (fieldname, _, format), column in zip(
+                line_class.FIELDS, columns[1:]):
+            if format in ('float', 'int'):
+                self._columns[fieldname] = np.array(
+                    [np.nan if value is None else value for value in column],
+                    dtype=float)
+            elif format == '######.##/######.##':
+                self._columns[fieldname] = np.array(
+                    [(np.nan, np.nan) if value is None else value
+                     for value in column], dtype=float).reshape(-1, 2)
+            else:
+                index = {}
+                codes = [-1 if value is None
+                         else index.setdefault(value, len(index))
+                         for value in column]
+                self._categories[fieldname] = sorted(index, key=index.get)
+                self._columns[fieldname] = np.array(
+                    codes, dtype=_code_type(len(index)))
+
+    def __len__(self):
+        return len(self.line_number)
+
+    @property
+    def nbytes(self):
+        """Bytes taken by the arrays (not counting the categories)."""
+        return self.line_number.nbytes + sum(
+            column.nbytes for column in self._columns.values())
+
+    def categories(self, fieldname):
+        """The distinct values of a text field, see codes()."""
+        return self._categories[fieldname]
+
+    def codes(self, fieldname):
+        """For every line, the index of its value of this text field in
+        categories(fieldname), or -1 if it is blank."""
+        if fieldname not in self._categories:
+            raise KeyError(fieldname)
+        return self._columns[fieldname]
+
+    def values(self, fieldname):
+        """The values of a field: the array of a number or coordinate
+        field, or for a text field an array of objects (None if blank)."""
+        column = self._columns[fieldname]
+        if fieldname not in self._categories:
+            return column
+        # Code -1 picks the None at the end
+        lookup = np.array(self._categories[fieldname] + [None], dtype=object)
+        return lookup[column]
+
+    def mask(self, fieldname, *values):
+        """Return a boolean array that is True for the lines that have one
+        of values for this field (None for blank)."""
+        column = self._columns[fieldname]
+        if fieldname not in self._categories:
+            return np.in1d(column, values)
+        wanted = set(value.strip() for value in values if value is not None)
+        codes = [code for code, category in enumerate(
+                self._categories[fieldname]) if category.strip() in wanted]
+        if None in values:
+            codes.append(-1)
+        return np.in1d(column, codes)
+
+    def counts(self, fieldname, where=None):
+        """Return a dictionary of value -> number of lines with it, of a
+        text field (None for blank), optionally only of the lines where
+        where (a boolean array, see mask()) is True."""
+        codes = self.codes(fieldname)
+        if where is not None:
+            codes = codes[where]
+        categories = self._categories[fieldname]
+        per_code = np.bincount(
+            codes.astype(np.int64) + 1, minlength=len(categories) + 1)
+        counts = {}
+        if per_code[0]:
+            counts[None] = int(per_code[0])
+        for category, count in zip(categories, per_code[1:]):
+            if count:
+                key = category.strip()
+                counts[key] = counts.get(key, 0) + int(count)
+        return counts
+
+    def line(self, i):
+        """Return the i-th line as a line object again."""
+        values = [int(self.line_number[i])]
+        for fieldname, _, format in self.line_class.FIELDS:
+            value = self._columns[fieldname][i]
+            if fieldname in self._categories:
+                value = (None if value < 0
+                         else self._categories[fieldname][value])
+            elif format == '######.##/######.##':
+                value = None if np.isnan(value[0]) else tuple(
+                    float(coordinate) for coordinate in value)
+            elif np.isnan(value):
+                value = None
+            else:
+                value = int(value) if format == 'int' else float(value)
+            values.append(value)
+        line = self.line_class.__new__(self.line_class)
+        line._set_values(tuple(values))
+        return line
+
+
+def _code_type(category_count):
+    """The smallest signed integer type that holds the codes of that many
+    categories, and -1."""
+    for code_type in (np.int8, np.int16, np.int32):
+        if category_count <= np.iinfo(code_type).max:
+            return code_type
+    return np.int64
@@ -11,4 +11,193 @@ from __future__ import division
 
 import collections
 
-Error = collections.namedtuple("Error", "line_number message")
+# Message of each error code, formatted with the details of an Error
+# (and its field, as {field}) when its message is read. Codes whose text
+# differs per field keep that text as their only detail.
+MESSAGES = {
+    None: "{0}",  # Error(line_number, message)
+    'field_count': "Regel heeft {0} velden, verwachtte er {1}.",
+    'field_length': ("Het {0}e veld, {field}, is {1} tekens lang, moet {2} "
+                     "zijn. Veld begint in kolom {3}."),
+    'field_format': ("Het {0}e veld, {field}, heeft als inhoud '{1}' en dat "
+                     "is niet van de vorm '{2}'."),
+    'record_type': "Onbekend recordtype: '{0}'.",
+    'missing': "{0}",
+    'choice': "{0}",
+    'file_missing': "'{0}' bestaat niet.",
+    'file_error': "Openen van bestand '{0}' resulteerde in {1}.",
+    'duplicate_manhole': "Knooppunt {0} komt al voor op regel {1}.",
+    'incomplete_sewer': "Streng {0} heeft geen twee knooppunten.",
+    'loop_sewer': "Streng {0} begint en eindigt in knooppunt {1}.",
+    'unknown_manhole': ("Streng {0} verwijst naar knooppunt {1}, dat niet "
+                        "als *PUT voorkomt."),
+    'unconnected_manhole': "Knooppunt {0} is met geen enkele streng verbonden.",
+    'component': ("Knooppunt {0} ligt in een deel van {1} knooppunten dat "
+                  "niet met de rest van het netwerk verbonden is."),
+    }
+
+
+# Number of messages kept by _message(), so that errors with the same
+# code, field and details share one message.
+MESSAGE_CACHE_SIZE = 1000
+_messages = {}
+
+
+class _Message(unicode):
+    """The message of an Error, that knows the code, field and details it
+    was formatted from."""
+
+
+def _message(code, field, details):
+    key = (code, field, details)
+    try:
+        return _messages[key]
+    except KeyError:
+        if len(_messages) >= MESSAGE_CACHE_SIZE:
+            _messages.clear()
+        message = _messages[key] = _Message(
+            MESSAGES[code].format(*details, field=field))
+        message.code = code
+        message.field = field
+        message.details = details
+        return message
+
+
+class Error(tuple):
+    """An error at a line (line_number None for the file as a whole).
+
+    An Error is the (line_number, message) tuple that errors always
+    were, so it unpacks, slices, formats and compares like one. Besides
+    that it has a code (see MESSAGES), the name of the field concerned
+    (or None) and a tuple of details, mostly numbers, that its Dutch
+    message is formatted from. Those are kept on the message, which is
+    shared by errors with the same code, field and details, so that a
+    file with the same error on every line doesn't take a string and
+    more per line.
+
+    Error(line_number, message) makes an error with code None that has
+    just that message."""
+    __slots__ = ()
+
+    def __new__(cls, line_number, message=None, code=None, field=None,
+                details=()):
+        if message is not None:
+            details = (message,)
+        return tuple.__new__(
+            cls, (line_number, _message(code, field, details)))
+
+    def __reduce__(self):
+        return (Error, (self.line_number, None, self.code, self.field,
+                        self.details))
+
+    line_number = property(lambda self: self[0])
+    message = property(lambda self: self[1])
+    code = property(lambda self: self[1].code)
+    field = property(lambda self: self[1].field)
+    details = property(lambda self: self[1].details)
+
+    # Like the namedtuple it was
+
+    _fields = ('line_number', 'message')
+
+    def _asdict(self):
+        return collections.OrderedDict(zip(self._fields, self))
+
+    def _replace(self, **kwargs):
+        """Return a copy with a new line_number and/or message. A new
+        message makes an error with code None."""
+        line_number = kwargs.pop('line_number', self.line_number)
+        message = kwargs.pop('message', None)
+        if kwargs:
+            raise ValueError(
+                "Got unexpected field names: {0!r}".format(list(kwargs)))
+        if message is not None:
+            return Error(line_number, message)
+        return Error(line_number, code=self.code, field=self.field,
+                     details=self.details)
+
+    def __repr__(self):
+        return "Error(line_number={0!r}, message={1!r})".format(*self)
+
+
+# One group of errors in an ErrorSummary: their code and field (see
+# Error), how many there are, the line numbers of the first few, and the
+# first one.
+ErrorGroup = collections.namedtuple(
+    "ErrorGroup", "code field count line_numbers example")
+
+
+class ErrorSummary(object):
+    """Counts errors per code and field, keeping only the first few
+    (samples) of each, instead of all of them. Errors with code None are
+    grouped by their message.
+
+    Can be passed to parsers.parse_collecting_errors() instead of a list
+    (it supports append(), extend() and +=), so that a file with the
+    same error on thousands of lines is summarized while it's parsed.
+    len() is the number of errors added."""
+
+    def __init__(self, errors=(), samples=5):
+        self.samples = samples
+        self._groups = collections.OrderedDict()  # Key -> [count, errors]
+        self._count = 0
+        self.extend(errors)
+
+    def __len__(self):
+        return self._count
+
+    def append(self, error):
+        key = (error.code, error.field,
+               error.details if error.code is None else None)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = [0, []]
+        group[0] += 1
+        if len(group[1]) < self.samples:
+            group[1].append(error)
+        self._count += 1
+
+    def extend(self, errors):
+        """Add errors, a sequence of Errors or another ErrorSummary."""
+        if isinstance(errors, ErrorSummary):
+            for key, (count, samples) in errors._groups.items():
+                group = self._groups.get(key)
+                if group is None:
+                    group = self._groups[key] = [0, []]
+                group[0] += count
+                group[1] += samples[:self.samples - len(group[1])]
+                self._count += count
+            return
+        for error in errors:
+            self.append(error)
+
+    def __iadd__(self, errors):
+        self.extend(errors)
+        return self
+
+    def counts(self):
+        """Return a dictionary of (code, field) -> number of errors."""
+        counts = collections.Counter()
+        for (code, field, _), (count, _) in self._groups.items():
+            counts[(code, field)] += count
+        return dict(counts)
+
+    def groups(self):
+        """Return ErrorGroups, the largest first, groups of the same size
+        in the order in which their first error was added."""
+        groups = [
+            ErrorGroup(code=code, field=field, count=count,
+                       line_numbers=[error.line_number for error in samples],
+                       example=samples[0] if samples else None)
+            for (code, field, _), (count, samples) in self._groups.items()]
+        groups.sort(key=lambda group: -group.count)  # Stable
+        return groups
+
+
+class LineError(ValueError):
+    """Raised when a field of a lazily parsed line (see
+    sufrib.SUFRIB21) is read, but the line isn't correct. The errors
+    attribute holds the Errors the line would give when parsed."""
+    def __init__(self, errors):
+        super(LineError, self).__init__(errors)
+        self.errors = errors
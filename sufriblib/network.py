@@ -0,0 +1,211 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""The sewer network of a RIB file: manholes (*PUT lines) connected by
+sewers (*RIOO lines), see RIB21.network()."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import collections
+import gc
+
+from .errors import Error
+
+
+def flow_direction(sewer):
+    """Return the (from, to) manhole ids of a *RIOO line in the direction
+    the water flows: from the higher to the lower invert level (BOB, ACR
+    at manhole 1 and ACS at manhole 2). If those aren't known or are
+    equal, from manhole 1 to manhole 2."""
+    if flows_backwards(sewer):
+        return sewer.manhole2_id, sewer.manhole1_id
+    return sewer.manhole1_id, sewer.manhole2_id
+
+
+def flows_backwards(sewer):
+    """Whether the water in a *RIOO line flows from manhole 2 to manhole
+    1, see flow_direction()."""
+    return (sewer.ACR is not None and sewer.ACS is not None and
+            sewer.ACR < sewer.ACS)
+
+
+class Network(object):
+    """Graph of the manholes and sewers of a RIB21 object, built in one
+    pass over its lines with dictionaries (no nested loops), so it scales
+    linearly with the number of sewers.
+
+    Manholes are known by their id. A manhole that a sewer refers to is
+    part of the graph even if it has no *PUT line; check() reports
+    those."""
+
+    def __init__(self, rib):
+        # The graph consists of many small lists and tuples; the garbage
+        # collector would go over all of them again and again while it's
+        # built, and nothing in it is garbage.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._build(rib)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _build(self, rib):
+        self.manholes = {}  # putid -> first *PUT line with that id
+        self.sewers = []  # *RIOO lines that have both manhole ids
+        self._duplicate_manholes = []
+        self._incomplete_sewers = []
+
+        # manhole id -> [(sewer, other manhole id)], and the manhole ids
+        # in order of appearance
+        self._adjacent = adjacent = {}
+        self._order = []
+        self._downstream = downstream = {}  # id -> [(sewer, manhole id)]
+        self._upstream = upstream = {}
+
+        for line in rib.lines_of_type('*PUT'):
+            putid = line.putid
+            if putid is None:
+                continue
+            if putid in self.manholes:
+                self._duplicate_manholes.append(line)
+            else:
+                self.manholes[putid] = line
+                adjacent[putid] = []
+                self._order.append(putid)
+
+        for sewer in rib.lines_of_type('*RIOO'):
+            manhole1_id = sewer.manhole1_id
+            manhole2_id = sewer.manhole2_id
+            if manhole1_id is None or manhole2_id is None:
+                self._incomplete_sewers.append(sewer)
+                continue
+            self.sewers.append(sewer)
+
+            for manhole_id, other_id in ((manhole1_id, manhole2_id),
+                                         (manhole2_id, manhole1_id)):
+                edges = adjacent.get(manhole_id)
+                if edges is None:
+                    edges = adjacent[manhole_id] = []
+                    self._order.append(manhole_id)
+                edges.append((sewer, other_id))
+
+            if flows_backwards(sewer):
+                manhole1_id, manhole2_id = manhole2_id, manhole1_id
+            downstream.setdefault(manhole1_id, []).append(
+                (sewer, manhole2_id))
+            upstream.setdefault(manhole2_id, []).append((sewer, manhole1_id))
+
+    def __contains__(self, manhole_id):
+        return manhole_id in self._adjacent
+
+    def neighbours(self, manhole_id):
+        """Return (sewer, manhole id) tuples of the sewers connected to
+        this manhole, and the manholes at their other ends."""
+        return list(self._adjacent.get(manhole_id, ()))
+
+    def downstream(self, manhole_id):
+        """Return the ids of all manholes that water flows to from this
+        manhole, nearest first (breadth first)."""
+        return _reachable(self._downstream, manhole_id)
+
+    def upstream(self, manhole_id):
+        """Return the ids of all manholes whose water flows to this
+        manhole, nearest first (breadth first)."""
+        return _reachable(self._upstream, manhole_id)
+
+    def components(self):
+        """Return the connected parts of the network as lists of manhole
+        ids, largest first. The ids in a part, and parts of the same
+        size, are in order of the manhole's first appearance."""
+        order = dict((manhole_id, i)
+                     for i, manhole_id in enumerate(self._order))
+        seen = set()
+        components = []
+        for manhole_id in self._order:
+            if manhole_id in seen:
+                continue
+            component = [manhole_id] + _reachable(
+                self._adjacent, manhole_id)
+            seen.update(component)
+            component.sort(key=order.__getitem__)
+            components.append(component)
+
+        components.sort(key=lambda component: -len(component))  # Stable
+        return components
+
+    def check(self, components=False):
+        """Return Errors for problems in the network, each with the
+        line number of the line concerned:
+
+        - a manhole id that is used by more than one *PUT line
+        - a *RIOO line without one of its manhole ids
+        - a sewer that starts and ends in the same manhole
+        - a sewer that refers to a manhole without a *PUT line
+        - a manhole that no sewer is connected to
+
+        With components=True, also one Error for every part of the
+        network that isn't connected to the largest part, at the line of
+        its first manhole (or sewer, for manholes without *PUT line)."""
+        errors = []
+
+        for line in self._duplicate_manholes:
+            errors.append(Error(
+                    line.line_number, code='duplicate_manhole',
+                    details=(line.putid,
+                             self.manholes[line.putid].line_number)))
+
+        for sewer in self._incomplete_sewers:
+            errors.append(Error(
+                    sewer.line_number, code='incomplete_sewer',
+                    details=(sewer.sewer_id,)))
+
+        for sewer in self.sewers:
+            if sewer.manhole1_id == sewer.manhole2_id:
+                errors.append(Error(
+                        sewer.line_number, code='loop_sewer',
+                        details=(sewer.sewer_id, sewer.manhole1_id)))
+            for manhole_id in (sewer.manhole1_id, sewer.manhole2_id):
+                if manhole_id not in self.manholes:
+                    errors.append(Error(
+                            sewer.line_number, code='unknown_manhole',
+                            details=(sewer.sewer_id, manhole_id)))
+
+        for putid, manhole in self.manholes.items():
+            if not self._adjacent[putid]:
+                errors.append(Error(
+                        manhole.line_number, code='unconnected_manhole',
+                        details=(putid,)))
+
+        if components:
+            for component in self.components()[1:]:
+                manhole_id = component[0]
+                if manhole_id in self.manholes:
+                    line_number = self.manholes[manhole_id].line_number
+                else:
+                    line_number = self._adjacent[manhole_id][0][0].line_number
+                errors.append(Error(
+                        line_number, code='component',
+                        details=(manhole_id, len(component))))
+
+        errors.sort(key=lambda error: error.line_number)  # Stable
+        return errors
+
+
+def _reachable(edges, start):
+    """Breadth first search: the ids reachable from start (not start
+    itself) over edges, a dictionary of id -> [(sewer, id)]."""
+    seen = set([start])
+    found = []
+    queue = collections.deque([start])
+    while queue:
+        for _, manhole_id in edges.get(queue.popleft(), ()):
+            if manhole_id not in seen:
+                seen.add(manhole_id)
+                found.append(manhole_id)
+                queue.append(manhole_id)
+    return found
@@ -9,64 +9,684 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 
+import contextlib
 import os
+import zlib
 
 from .errors import Error
+from .errors import ErrorSummary
 
+from . import stats as stats_module
 from . import sufrib
 
+# multiprocessing and zipfile are only imported by the functions that use
+# them, they take longer to import than the rest of sufriblib.
+
+
+# Files are read in blocks of about this many bytes, see _line_blocks()
+BLOCK_SIZE = 1024 * 1024
+
+# Parsing a file in parallel (see parse_collecting_errors) isn't worth
+# it for chunks smaller than this many bytes.
+MIN_CHUNK_SIZE = 256 * 1024
+
+# Names of the members of a zip archive that parse_archive() parses
+ARCHIVE_SUFFIXES = ('.rib', '.rmb', '.rib.gz', '.rmb.gz')
+
+# zlib's wbits for data with a gzip header and trailer
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# Translation table that replaces all non-ASCII bytes by '?'
+_ASCII = bytes(bytearray(range(128))) + b'?' * 128
+
 
 def enumerate_file(path):
     """Opens file, deals with strange characters, and yields pairs
     of (line_number, stripped line). Line numbers start with 1. May
     raise IOError."""
-    sufribfile = file(path, 'rU')  # All-platform line endings
+    return enumerate_file_range(path, 0, None, 1)
+
+
+def enumerate_file_range(path, start, end, first_line_number):
+    """Like enumerate_file, but only for the bytes from start to end
+    (None for the end of the file). Start must be at the start of a line
+    (see _chunks()). The first line gets number first_line_number. May
+    raise IOError.
+
+    The file is read in blocks of whole lines, so that the clean up of
+    characters and line endings is done in a few passes over each block
+    instead of for every line."""
+    line_number = first_line_number
+    for lines in _raw_lines(path, start, end):
+        # Lines are pure ASCII by now, decode them with the default codec
+        lines = list(map(unicode, lines))
+        for numbered_line in enumerate(lines, line_number):
+            yield numbered_line
+        line_number += len(lines)
+
+
+def _raw_lines(path, start, end):
+    """Yield lists of lines, as byte strings with all non-ASCII
+    characters replaced, of the bytes from start to end of the file."""
+    with open(path, 'rb') as sufribfile:
+        for block in _line_blocks(sufribfile, start, end):
+            # All non-ASCII characters end up as '?'. The SUFRIB standard
+            # prescribes ASCII, but this seems less harsh than throwing
+            # an error.
+            block = block.translate(_ASCII)
+
+            # splitlines() on bytes handles all-platform line endings
+            # exactly like 'rU' mode. Don't strip spaces! The last field
+            # on a line must have the right size, and that often means
+            # trailing spaces are necessary.
+            yield block.splitlines()
+
+
+def _line_blocks(sufribfile, start, end):
+    """Yield the bytes from start to end of the file in blocks of about
+    BLOCK_SIZE that end at the end of a line. Only one block (and the
+    start of the next line) is in memory at a time."""
+    size = os.fstat(sufribfile.fileno()).st_size
+    if end is None or end > size:
+        end = size
+
+    sufribfile.seek(start)
+    position = start
+    rest = b''  # Start of a line that didn't end in the previous block
+    while position < end:
+        data = sufribfile.read(min(BLOCK_SIZE, end - position))
+        if not data:
+            break
+        position += len(data)
+        block = rest + data
+        # end is always at the end of a line
+        line_end = len(block) if position >= end else _line_end(block)
+        block, rest = block[:line_end], block[line_end:]
+        if block:
+            yield block
+    if rest:
+        yield rest
 
-    for line_number, line in enumerate(sufribfile, 1):
-        # By decoding from and encoding to ASCII, all non-ASCII
-        # characters end up as '?'. The SUFRIB standard prescribes
-        # ASCII, but this seems less harsh than throwing an error.
-        line = line.decode('ascii', 'replace')
-        line = line.encode('ascii', 'replace')
 
-        line = line.strip("\r\n")  # Don't strip spaces! The last
-                                   # field on a line must have the
-                                   # right size, and that often means
-                                   # trailing spaces are necessary.
+def _line_end(data):
+    """Return the offset just after the last line ending ('\\n', '\\r\\n'
+    or '\\r', like with 'rU') in data, or 0 if there is none. A '\\r' at
+    the very end could still become a '\\r\\n', so it doesn't count."""
+    return max(data.rfind(b'\n'), data.rfind(b'\r', 0, len(data) - 1)) + 1
 
-        yield (line_number, line)
 
+def parse(path, columnar=False, workers=1, cache=None, lazy=False,
+          stats=None):
+    """Parse the file at path, return a (RIB21 or RMB21 object, []) tuple
+    if it is correct or (None, list of errors) if it isn't. If columnar
+    is True, the *MRIO lines of RMB files are stored as NumPy arrays,
+    see sufrib.RMB21. For workers and lazy, see parse_collecting_errors.
+
+    If cache is a cache.ParseCache, the result is taken from it if the
+    file didn't change since it was stored, and stored in it otherwise.
+
+    If stats is a stats.ParseStats, it is filled with statistics about
+    the parse."""
+    if cache is not None:
+        start = stats_module.clock()
+        result = cache.get(path, columnar, lazy)
+        if result is not None:
+            if stats is not None:
+                stats.cached = True
+                stats.finish(result[1], stats_module.clock() - start)
+            return result
 
-def parse(path):
     errors = []
 
-    ribfile = parse_collecting_errors(errors, path)
+    ribfile = parse_collecting_errors(
+        errors, path, columnar, workers, lazy, stats)
 
     if errors:
-        return None, errors
+        result = None, errors
+    else:
+        result = ribfile, []
+
+    if cache is not None:
+        cache.put(path, columnar, result, lazy)
+    return result
+
+
+def parse_collecting_errors(
+        errors, path, columnar=False, workers=1, lazy=False, stats=None):
+    """Parse the file at path, add its errors to errors and return a
+    RIB21 or RMB21 object.
+
+    If lazy is True, lines are kept unparsed and their fields are only
+    decoded when they are read (see sufrib.SUFRIB21). Then the only
+    errors are unknown record types; the object's validate() method
+    returns the others.
+
+    If workers is more than 1 (None means the number of CPUs), a large
+    file is split into chunks of whole lines that are parsed in a pool of
+    that many processes. The result, including line numbers and the
+    order of the errors, is the same as when it's parsed sequentially.
+
+    If stats is a stats.ParseStats, it is filled with statistics about
+    the parse.
+
+    Errors can be an errors.ErrorSummary instead of a list, to only
+    count the errors (and keep a few of each kind)."""
+    if stats is None:
+        return _parse_collecting_errors(
+            errors, path, columnar, workers, lazy, None)
+
+    start = stats_module.clock()
+    if isinstance(errors, ErrorSummary):
+        new_errors = ErrorSummary(samples=errors.samples)
     else:
-        return ribfile, []
+        new_errors = []
+    sufribobject = _parse_collecting_errors(
+        new_errors, path, columnar, workers, lazy, stats)
+    errors += new_errors
+    stats.finish(new_errors, stats_module.clock() - start)
+    return sufribobject
 
 
-def parse_collecting_errors(errors, path):
+def _parse_collecting_errors(errors, path, columnar, workers, lazy, stats):
     if not os.path.exists(path):
-        errors.append(
-            Error(None, "'{path}' bestaat niet.", {'path': path}))
+        errors.append(_missing_file_error(path))
         return
 
+    sufribobject = _new_sufribobject(path, columnar, lazy)
+
+    if workers != 1:
+        import multiprocessing
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+    if workers != 1:
+        try:
+            chunks = _chunks(path, workers)
+        except IOError as e:
+            errors.append(_io_error(path, e))
+            return sufribobject
+
+        if len(chunks) > 1:
+            pool = multiprocessing.Pool(workers)
+            try:
+                results = pool.map(
+                    _parse_chunk,
+                    [(path, columnar, lazy, stats is not None) + chunk
+                     for chunk in chunks],
+                    chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+
+            for chunk_object, chunk_errors, chunk_stats in results:
+                errors += chunk_errors
+                sufribobject.extend(chunk_object)
+                if stats is not None:
+                    stats.merge(chunk_stats)
+            return sufribobject
+
+    _add_lines(sufribobject, errors, path, 0, None, 1, stats)
+    return sufribobject
+
+
+def _new_sufribobject(path, columnar, lazy):
     if path.lower().endswith(".rmb"):
-        sufribobject = sufrib.RMB21()
+        return sufrib.RMB21(columnar=columnar, lazy=lazy)
+    else:
+        return sufrib.RIB21(lazy=lazy)
+
+
+def _add_lines(sufribobject, errors, path, start, end, first_line_number,
+               stats=None):
+    """Add the lines from start to end of the file to sufribobject.
+    Returns the line number the next line would get."""
+    return _add_blocks(sufribobject, errors, _raw_lines(path, start, end),
+                       first_line_number, stats, path)
+
+
+def _add_blocks(sufribobject, errors, blocks, first_line_number,
+                stats=None, path=None):
+    """Add blocks of lines (see _raw_lines()) to sufribobject. Returns the
+    line number the next line would get. An IOError while reading the
+    blocks is added to errors, as an error about path."""
+    if sufribobject.lazy:
+        add_line = sufribobject.add_raw_line
+
+        def add_lines(line_number, lines, errors, _=None):
+            for line in lines:
+                add_line(line_number, line, errors)
+                line_number += 1
+            return line_number
     else:
-        sufribobject = sufrib.RIB21()
+        add_line = sufribobject.add_line
+        add_lines = sufribobject.add_lines
+        # Lines are pure ASCII, decode them with the default codec
+        blocks = (list(map(unicode, lines)) for lines in blocks)
+
+    if stats is not None:
+        blocks = stats.timed_blocks(blocks)
+
+    line_number = first_line_number
+    try:
+        for lines in blocks:
+            if stats is not None:
+                line_number = stats.add_lines(
+                    add_lines, add_line, lines, line_number, errors)
+            else:
+                line_number = add_lines(line_number, lines, errors)
+    except IOError as e:
+        errors.append(_io_error(path, e))
+
+    return line_number
+
+
+def _chunks(path, workers):
+    """Split the file into about workers chunks of whole lines. Returns a
+    list of (start, end, first_line_number) tuples. May raise IOError."""
+    chunk_size = max(
+        MIN_CHUNK_SIZE, os.path.getsize(path) // workers + 1)
+
+    chunks = []
+    start = 0
+    line_number = 1
+    rest = b''  # Start of a line that didn't end in the previous chunk
+    with open(path, 'rb') as sufribfile:
+        while True:
+            data = sufribfile.read(chunk_size)
+            at_end = not data
+            # Chunks end after a line ending, so that they don't split
+            # lines, nor '\r\n' line endings
+            data = rest + data
+            line_end = len(data) if at_end else _line_end(data)
+            data, rest = data[:line_end], data[line_end:]
+            if data:
+                chunks.append((start, start + len(data), line_number))
+                start += len(data)
+                # Lines end with '\n', '\r\n' or '\r', like with 'rU'
+                line_number += (data.count(b'\n') + data.count(b'\r') -
+                                data.count(b'\r\n'))
+            if at_end:
+                break
+
+    return chunks
+
+
+def _parse_chunk(arguments):
+    # Module level function, so that it can be used by the process pool
+    path, columnar, lazy, with_stats, start, end, first_line_number = (
+        arguments)
+    errors = []
+    stats = stats_module.ParseStats() if with_stats else None
+    sufribobject = _new_sufribobject(path, columnar, lazy)
+    _add_lines(
+        sufribobject, errors, path, start, end, first_line_number, stats)
+    return sufribobject, errors, stats
+
+
+def parse_many(paths, workers=None, columnar=False, lazy=False):
+    """Parse many files with a pool of worker processes (workers is the
+    number of processes, default the number of CPUs). Returns a list of
+    (sufribobject, errors) tuples like parse() returns them, in the same
+    order as paths.
+
+    The parsed objects are sent back to this process pickled, with the
+    values of the lines of each record type in columns (see
+    sufrib._pack_lines()); the lines are only made in this process when
+    they're first used. With columnar=True the *MRIO lines are sent as
+    arrays. Lazily parsed lines are sent as the line itself."""
+    import multiprocessing
+    arguments = [(path, columnar, lazy) for path in paths]
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers == 1 or len(arguments) <= 1:
+        return [_parse_arguments(argument) for argument in arguments]
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        # chunksize 1: files can differ a lot in size
+        return pool.map(_parse_arguments, arguments, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _parse_arguments(arguments):
+    # Module level function, so that it can be used by the process pool
+    path, columnar, lazy = arguments
+    return parse(path, columnar, lazy=lazy)
+
+
+def validate(path, max_errors=None):
+    """Return the errors that parse() would give for the file at path,
+    without keeping anything. Stops after max_errors errors, if given.
+
+    Lines are first checked with the line class's validate_line(), which
+    doesn't make a line object; only lines that fail that are parsed to
+    find their errors."""
+    if not os.path.exists(path):
+        return [_missing_file_error(path)]
+
+    line_classes = dict(
+        (record_type.encode('ascii'), line_class) for record_type, line_class
+        in sufrib.SUFRIB21.LINE_CLASSES.items())
+    errors = []
+    line_number = 0
+    try:
+        for lines in _raw_lines(path, 0, None):
+            for line in lines:
+                line_number += 1
+                line_class = line_classes.get(
+                    line.partition(b'|')[0].strip())
+                if (line_class is not None and
+                        line_class.validate_line(line)):
+                    continue
+
+                errors += sufrib.SUFRIB21.parse_line(
+                    line_number, unicode(line))[1]
+                if max_errors is not None and len(errors) >= max_errors:
+                    return errors[:max_errors]
+    except IOError as e:
+        errors.append(_io_error(path, e))
+
+    return errors
+
+
+def iterate_records(path):
+    """Yield a (line_number, record_or_errors) pair for each line of the
+    file, where record_or_errors is either a line object (see
+    sufrib.SUFRIB21.parse_line) or a list of errors. Nothing is kept,
+    so memory use doesn't depend on the size of the file.
+
+    Errors about the file as a whole (it doesn't exist, it can't be
+    read) are yielded with line number None."""
+    if not os.path.exists(path):
+        yield None, [_missing_file_error(path)]
+        return
 
     try:
         for line_number, line in enumerate_file(path):
-            sufribobject.add_line(line_number, line, errors)
+            record, errors = sufrib.SUFRIB21.parse_line(line_number, line)
+            yield line_number, (errors or record)
     except IOError as e:
-        errors.append(
-            Error(
-                None,
-                "Openen van bestand '{path}' resulteerde in {exception}.",
-                {'path': path, 'exception': unicode(e)}))
+        yield None, [_io_error(path, e)]
 
-    return sufribobject
+
+class TailParser(object):
+    """Parses a file that is still being written to, like an RMB file
+    during an inspection, a piece at a time.
+
+    Every call of update() parses only the lines that were added to the
+    file since the previous call, into the same RIB21 or RMB21 object
+    (self.sufribobject). A last line that doesn't end with a line ending
+    yet is left for the next call, unless final is True.
+
+    If the file became smaller than what was already parsed, it was
+    replaced, and it is parsed again from the start into a new object."""
+
+    def __init__(self, path, columnar=False, lazy=False):
+        self.path = path
+        self.columnar = columnar
+        self.lazy = lazy
+        self._reset()
+
+    def _reset(self):
+        self.sufribobject = _new_sufribobject(
+            self.path, self.columnar, self.lazy)
+        self.errors = []
+        self.offset = 0  # Byte offset of the first line not parsed yet
+        self.line_number = 1  # And its line number
+
+    def update(self, final=False):
+        """Parse the lines that were added since the previous call and
+        return their errors (they're also added to self.errors). A file
+        that doesn't exist (yet) has no lines."""
+        errors = []
+        try:
+            with open(self.path, 'rb') as sufribfile:
+                size = os.fstat(sufribfile.fileno()).st_size
+                if size < self.offset:
+                    self._reset()
+                end = _complete_lines_end(
+                    sufribfile, self.offset, size, final)
+        except IOError as e:
+            if os.path.exists(self.path):
+                errors.append(_io_error(self.path, e))
+            end = self.offset
+
+        if end > self.offset:
+            self.line_number = _add_lines(
+                self.sufribobject, errors, self.path, self.offset, end,
+                self.line_number)
+            self.offset = end
+
+        self.errors += errors
+        return errors
+
+
+class FeedParser(object):
+    """Parses a RIB or RMB file that is given a piece at a time, for
+    instance as it is uploaded: feed() it chunks of bytes of any size,
+    and the lines in them are parsed as soon as they are complete. After
+    close(), self.sufribobject and self.errors are the same as what
+    parse_collecting_errors() gives for the whole file.
+
+    The filename (only its extension is used) says whether it is a RIB
+    or an RMB file. To parse an asyncio StreamReader::
+
+        parser = FeedParser(filename)
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            parser.feed(chunk)
+        sufribobject = parser.close()
+    """
+
+    def __init__(self, filename, columnar=False, lazy=False):
+        self.sufribobject = _new_sufribobject(filename, columnar, lazy)
+        self.errors = []
+        self.line_number = 1  # Of the first line not parsed yet
+        self._pending = []  # Chunks of the last, incomplete line
+
+    def feed(self, data):
+        """Parse the lines that data completes. Returns their errors
+        (they're also added to self.errors)."""
+        # A '\r' at the very end could still become a '\r\n', so it
+        # doesn't count.
+        end = len(data) - 1 if data.endswith(b'\r') else len(data)
+        line_end = max(data.rfind(b'\n', 0, end), data.rfind(b'\r', 0, end))
+        if line_end == -1:
+            if data:
+                self._pending.append(data)
+            return []
+
+        self._pending.append(data[:line_end + 1])
+        complete = b''.join(self._pending)
+        self._pending = [data[line_end + 1:]]
+        return self._add(complete)
+
+    def close(self):
+        """Parse the last line, if it didn't end with a line ending, and
+        return self.sufribobject."""
+        self._add(b''.join(self._pending))
+        self._pending = []
+        return self.sufribobject
+
+    def _add(self, data):
+        errors = []
+        # Non-ASCII characters and line endings like _raw_lines()
+        self.line_number = _add_blocks(
+            self.sufribobject, errors, [data.translate(_ASCII).splitlines()],
+            self.line_number)
+        self.errors += errors
+        return errors
+
+
+def parse_file_object(fileobj, filename, columnar=False, lazy=False):
+    """Parse a file object opened in binary mode (an uploaded file, a
+    socket's makefile('rb'), ...) with a FeedParser. The filename says
+    whether it's a RIB or RMB file. Returns a tuple like parse(). May
+    raise IOError."""
+    return _parse_chunks(_read_chunks(fileobj), filename, columnar, lazy)
+
+
+def _parse_chunks(chunks, filename, columnar, lazy):
+    parser = FeedParser(filename, columnar, lazy)
+    for chunk in chunks:
+        parser.feed(chunk)
+    sufribobject = parser.close()
+    if parser.errors:
+        return None, parser.errors
+    return sufribobject, []
+
+
+def _read_chunks(fileobj):
+    while True:
+        data = fileobj.read(BLOCK_SIZE)
+        if not data:
+            return
+        yield data
+
+
+def _gunzip(chunks):
+    """Decompress gzipped data, given in chunks, a chunk at a time. Works
+    on file objects that can't seek (unlike gzip.GzipFile in Python 2),
+    and for several gzip members after each other. Raises zlib.error if
+    the data ends before the end of the last member."""
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            chunk = decompressor.unused_data  # The start of a next member
+            if chunk:
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+    at_end = _at_end(decompressor)
+    yield decompressor.flush()
+    if not at_end:
+        raise zlib.error("incomplete or truncated stream")
+
+
+def _at_end(decompressor):
+    """Whether decompressor has reached the end of its stream."""
+    eof = getattr(decompressor, 'eof', None)  # Only in Python 3
+    if eof is not None:
+        return eof
+    # Data after the end of the stream is left in unused_data
+    probe = decompressor.copy()
+    try:
+        probe.decompress(b'\0')
+    except zlib.error:
+        return False
+    return bool(probe.unused_data)
+
+
+def _member_name(name):
+    """Name of a zip archive member as text. In Python 2, zipfile only
+    decodes names that are flagged as UTF-8; the others are bytes in
+    cp437, the original encoding of zip files."""
+    if isinstance(name, bytes):
+        return name.decode('cp437')
+    return name
+
+
+def parse_archive(path, workers=None, columnar=False, lazy=False):
+    """Parse the RIB and RMB files in a zip archive, or a single gzipped
+    file (if path ends with .gz), without extracting them. Returns a
+    list of (name, (sufribobject, errors)) tuples, with the tuples like
+    parse() returns them, in the order of the archive.
+
+    The members of a zip archive that are parsed are those whose names
+    end with .rib or .rmb, or .rib.gz or .rmb.gz for members that are
+    gzipped themselves (in any case). The name decides whether it is a
+    RIB or RMB file, like the path does for parse().
+
+    Members are decompressed and parsed in a pool of that many worker
+    processes (None means the number of CPUs), that each read their
+    members from the archive. If the archive itself can't be read, the
+    list has one tuple, with path as name and the error. Names are
+    always text, see _member_name()."""
+    import multiprocessing
+    import zipfile
+    if not os.path.exists(path):
+        return [(path, (None, [_missing_file_error(path)]))]
+    if path.lower().endswith('.gz'):
+        return [(path, _parse_archive_member((path, None, columnar, lazy)))]
+
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = [name for name in archive.namelist()
+                     if _member_name(name).lower().endswith(
+                         ARCHIVE_SUFFIXES)]
+    except (IOError, zipfile.BadZipfile) as e:
+        return [(path, (None, [_io_error(path, e)]))]
+
+    arguments = [(path, name, columnar, lazy) for name in names]
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers == 1 or len(arguments) <= 1:
+        results = [_parse_archive_member(argument) for argument in arguments]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(_parse_archive_member, arguments, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return list(zip(map(_member_name, names), results))
+
+
+def _parse_archive_member(arguments):
+    # Module level function, so that it can be used by the process pool.
+    # Name is None for a gzipped file that isn't in a zip archive.
+    import zipfile
+    path, name, columnar, lazy = arguments
+    member = path if name is None else _member_name(name)
+    filename = member
+    gzipped = filename.lower().endswith('.gz')
+    if gzipped:
+        filename = filename[:-len('.gz')]
+
+    try:
+        if name is None:
+            fileobj = open(path, 'rb')
+        else:
+            with zipfile.ZipFile(path) as archive:
+                # Keeps the archive's file open until it's closed itself
+                fileobj = archive.open(name)
+        with contextlib.closing(fileobj):
+            chunks = _read_chunks(fileobj)
+            if gzipped:
+                chunks = _gunzip(chunks)
+            return _parse_chunks(chunks, filename, columnar, lazy)
+    except (IOError, zipfile.BadZipfile, zlib.error) as e:
+        return None, [_io_error(member, e)]
+
+
+def _complete_lines_end(sufribfile, start, size, final):
+    """Return the offset just after the last line ending between start
+    and size, or start if there is none. If final, the file is complete
+    and that is size. A '\r' at the very end could still become a
+    '\r\n', so it doesn't count."""
+    if final:
+        return size
+
+    end = size
+    while end > start:
+        block_start = max(start, end - BLOCK_SIZE)
+        sufribfile.seek(block_start)
+        block = sufribfile.read(end - block_start)
+        if end == size and block.endswith(b'\r'):
+            block = block[:-1]
+        line_end = max(block.rfind(b'\n'), block.rfind(b'\r'))
+        if line_end != -1:
+            return block_start + line_end + 1
+        end = block_start
+    return start
+
+
+def _missing_file_error(path):
+    return Error(None, code='file_missing', details=(path,))
+
+
+def _io_error(path, e):
+    return Error(None, code='file_error', details=(path, unicode(e)))
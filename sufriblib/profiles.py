@@ -0,0 +1,195 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Longitudinal profiles of sewers, from the *MRIO measurements of an
+RMB file, see Profiles. Needs numpy, like sufriblib.columnar."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import collections
+import math
+
+import numpy as np
+
+from . import columnar
+from . import network
+
+# Views on the arrays of a Profiles object for one sewer
+SewerProfile = collections.namedtuple(
+    "SewerProfile", "sewer_id sewer distance value line_number sag")
+
+# Per sewer statistics, see Profiles.statistics()
+SagStatistics = collections.namedtuple(
+    "SagStatistics",
+    "points length max_sag sag_points sag_volume counter_slope_length")
+
+# Sags shallower than this (in the unit of the measurements) are noise
+SAG_TOLERANCE = 1e-9
+
+
+def sewer_length(sewer):
+    """Length of a *RIOO line: the distance between its manholes' RD
+    points, or else its expected inspection length (ABQ). None if neither
+    is known."""
+    if sewer is None:
+        return None
+    point1 = sewer.manhole1_rd_point
+    point2 = sewer.manhole2_rd_point
+    if point1 is not None and point2 is not None:
+        return math.hypot(point2[0] - point1[0], point2[1] - point1[1])
+    try:
+        return float(sewer.ABQ)
+    except (TypeError, ValueError):
+        return None
+
+
+class Profiles(object):
+    """The measurements of an RMB21 object as profiles per sewer, all in
+    a few NumPy arrays (see columnar.MrioColumns), in one pass:
+
+    - every measurement's distance is made the distance from manhole 1:
+      if it was measured from manhole 2 (ZYB is 2), it is the sewer's
+      length minus ZYA
+    - the *RIOO line of each sewer is looked up by sewer id in rib (or,
+      without rib, in the RMB file itself), for the length and the flow
+      direction
+    - measurements are sorted by sewer, then by distance
+    - sags are computed for all sewers at once, see statistics()
+
+    The measurements are taken to be heights (ZYR B or C), for other
+    kinds of measurement the sag statistics mean nothing. If a sewer's
+    length isn't known, its largest ZYA is used."""
+
+    def __init__(self, rmb, rib=None):
+        columns = rmb.columns
+        if columns is None:
+            columns = columnar.MrioColumns.from_lines(
+                rmb.lines_of_type('*MRIO'))
+
+        lookup = (rib if rib is not None else rmb).sewer
+        self.sewer_ids = list(columns.sewer_ids)
+        self.sewers = [lookup(sewer_id) for sewer_id in self.sewer_ids]
+        self._codes = dict(
+            (sewer_id, code) for code, sewer_id in enumerate(self.sewer_ids))
+
+        code = columns.sewer_code
+        distance = columns.distance
+        direction = columns.direction
+        self.starts = starts = columns._column('starts')
+
+        lengths = np.array(
+            [sewer_length(sewer) for sewer in self.sewers], dtype=float)
+        if len(code):
+            unknown = np.isnan(lengths)
+            lengths[unknown] = np.maximum.reduceat(
+                distance, starts[:-1])[unknown]
+        self.lengths = lengths
+
+        distance = np.where(
+            direction == 2, lengths[code] - distance, distance)
+        order = np.lexsort((distance, code))
+
+        self.code = code[order]
+        self.distance = distance[order]
+        self.value = columns.measurement[order]
+        self.line_number = columns.line_number[order]
+
+        # +1 if water flows from manhole 1 to 2, -1 otherwise
+        self.flow = np.array(
+            [-1 if sewer is not None and network.flows_backwards(sewer)
+             else 1 for sewer in self.sewers], dtype=np.int8)
+
+        self.sag = _sag_depths(self.code, self.value, len(self.sewer_ids))
+
+    def __len__(self):
+        return len(self.sewer_ids)
+
+    def profile(self, sewer_id):
+        """Return a SewerProfile of views (not copies) on the arrays for
+        this sewer. Raises KeyError for unknown sewer ids."""
+        code = self._codes[sewer_id]
+        where = slice(self.starts[code], self.starts[code + 1])
+        return SewerProfile(
+            sewer_id=sewer_id,
+            sewer=self.sewers[code],
+            distance=self.distance[where],
+            value=self.value[where],
+            line_number=self.line_number[where],
+            sag=self.sag[where])
+
+    def statistics(self):
+        """Return a dictionary of sewer id -> SagStatistics:
+
+        - points: number of measurements, length: of the sewer
+        - max_sag: the largest depth of water that would stay behind at
+          a measurement if the sewer ran empty (over both ends), that is
+          how far it lies below the lowest of the highest points on
+          either side of it
+        - sag_points: the number of measurements with such water
+        - sag_volume: the integral of that depth over the distance (a
+          cross section, per unit of pipe width)
+        - counter_slope_length: the length along which the profile
+          rises in the direction of the flow"""
+        count = len(self.sewer_ids)
+        if not len(self.code):
+            return {}
+        group_starts = self.starts[:-1]
+        points = np.diff(self.starts)
+        max_sag = np.maximum.reduceat(self.sag, group_starts)
+        sag_points = np.add.reduceat(
+            (self.sag > SAG_TOLERANCE).astype(np.int64), group_starts)
+
+        # Per pair of consecutive measurements of the same sewer
+        same_sewer = self.code[1:] == self.code[:-1]
+        pair_code = self.code[1:]
+        step = np.diff(self.distance)
+        rise = np.diff(self.value) * self.flow[pair_code]
+        counter_slope = np.bincount(
+            pair_code, weights=np.where(same_sewer & (rise > 0), step, 0),
+            minlength=count)
+        # Trapezoid rule
+        sag_volume = np.bincount(
+            pair_code,
+            weights=np.where(
+                same_sewer, step * (self.sag[1:] + self.sag[:-1]) / 2, 0),
+            minlength=count)
+
+        return dict(
+            (sewer_id, SagStatistics(
+                    points=int(points[code]),
+                    length=float(self.lengths[code]),
+                    max_sag=float(max_sag[code]),
+                    sag_points=int(sag_points[code]),
+                    sag_volume=float(sag_volume[code]),
+                    counter_slope_length=float(counter_slope[code])))
+            for code, sewer_id in enumerate(self.sewer_ids))
+
+
+def _sag_depths(code, value, count):
+    """For every measurement, how far it lies below the lower of the
+    highest measurements before and after it in the same sewer. Values
+    must be sorted by code.
+
+    The running maximum per sewer is computed for all sewers at once on
+    the ranks of the values, to which an offset per sewer is added that
+    is larger than any rank, so that no sewer's maximum carries over to
+    the next one. Those are integers, so unlike with the values
+    themselves no precision is lost."""
+    if not len(value):
+        return np.zeros(0)
+    number = len(value)
+    order = np.argsort(value, kind='mergesort')
+    sorted_value = value[order]
+    rank = np.empty(number, dtype=np.int64)
+    rank[order] = np.arange(number)
+
+    offset = code.astype(np.int64) * number
+    left = sorted_value[np.maximum.accumulate(rank + offset) - offset]
+    offset = (count - code).astype(np.int64) * number
+    right = sorted_value[np.maximum.accumulate(
+            (rank + offset)[::-1])[::-1] - offset]
+    return np.maximum(np.minimum(left, right) - value, 0)
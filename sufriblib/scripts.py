@@ -11,31 +11,214 @@ from __future__ import division
 
 
 import argparse
+import errno
+import json
 import os
+import shutil
 import sys
+import tempfile
 
 from . import parsers
+from . import sufrib
+
+# Exit statuses of sufribcat
+OK = 0
+FILE_ERRORS = 1  # Some file had errors
+BAD_ARGUMENTS = 2  # Some path wasn't a readable RIB or RMB file
 
 
 def sufribcat():
     parser = argparse.ArgumentParser(
- description="Read a .RIB or .RMB SUFRIB 2.1 file, and print errors "
-             "or a copy of the file.")
-    parser.add_argument("filename")
+ description="Read .RIB and .RMB SUFRIB 2.1 files, and print their errors "
+             "and a copy of their correct lines, while they are parsed.",
+ epilog="Exit status is 0 if all files are correct, 1 if there were "
+        "errors in files, 2 if some path wasn't a .RIB or .RMB file.")
+    parser.add_argument(
+        "paths", nargs="+", metavar="path",
+        help="A file, or a directory to search for .RIB and .RMB files")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="Parse this many files at the same time (default 1)")
+    parser.add_argument(
+        "--json", action="store_true",
+        help="Print a JSON object per line: the record with its fields, "
+             "or the error")
+    parser.add_argument(
+        "--errors-only", action="store_true",
+        help="Only print the errors")
+    args = parser.parse_args()
+
+    status = OK
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths += _sufrib_files(path)
+        elif not os.path.isfile(path):
+            _complain("Not a readable file: {path}".format(path=path))
+            status = BAD_ARGUMENTS
+        elif not path.lower().endswith((".rib", ".rmb")):
+            _complain("Not a .RIB or .RMB file: {path}".format(path=path))
+            status = BAD_ARGUMENTS
+        else:
+            paths.append(path)
+
+    # Bytes, so that it works the same in Python 2 and 3
+    output = getattr(sys.stdout, 'buffer', sys.stdout)
+    try:
+        if args.jobs == 1 or len(paths) <= 1:
+            error_counts = (
+                _cat(path, output, args.json, args.errors_only)
+                for path in paths)
+        else:
+            error_counts = _cat_in_parallel(
+                paths, output, args.json, args.errors_only, args.jobs)
+
+        for error_count in error_counts:
+            if error_count and status == OK:
+                status = FILE_ERRORS
+        output.flush()
+    except IOError as e:
+        if e.errno != errno.EPIPE:  # Like when piped into head
+            raise
+
+    sys.exit(status)
+
+
+def _complain(message):
+    print(message, file=sys.stderr)
+
+
+def _sufrib_files(directory):
+    """Return the paths of the RIB and RMB files in directory and its
+    subdirectories, sorted. Broken links and such are skipped."""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        paths += [
+            os.path.join(dirpath, filename) for filename in sorted(filenames)
+            if filename.lower().endswith((".rib", ".rmb")) and
+            os.path.isfile(os.path.join(dirpath, filename))]
+    return paths
+
+
+def _cat(path, output, as_json, errors_only):
+    """Write the errors and correct lines of the file at path to output,
+    one per line, while parsing it. Nothing is kept. Returns the number
+    of errors."""
+    error_count = 0
+    if not os.path.exists(path):
+        lines = iter(())
+        file_errors = [parsers._missing_file_error(path)]
+    else:
+        lines = parsers.enumerate_file(path)
+        file_errors = []
+
+    while True:
+        try:
+            line_number, line = next(lines)
+        except StopIteration:
+            break
+        except IOError as e:
+            file_errors.append(parsers._io_error(path, e))
+            break
 
-    path = parser.parse_args().filename
+        record, errors = sufrib.SUFRIB21.parse_line(line_number, line)
+        if errors:
+            for error in errors:
+                output.write(_format_error(path, error, as_json))
+            error_count += len(errors)
+        elif not errors_only:
+            output.write(_format_record(path, line, record, as_json))
 
-    if not os.path.exists(path) or not os.path.isfile(path):
-        print("Not a readable file: {path}".format(path=path))
-        sys.exit(1)
+    for error in file_errors:
+        output.write(_format_error(path, error, as_json))
+    return error_count + len(file_errors)
 
-    if not (path.lower().endswith(".rib") or path.lower().endswith("rmb")):
-        print("Not a .RIB or .RMB file: {path}".format(path=path))
-        sys.exit(1)
 
-    ob, errors = parsers.parse(path)
-    if errors:
-        for error in errors:
-            print(unicode(error))
+def _format_error(path, error, as_json):
+    if as_json:
+        text = json.dumps({
+                'file': path,
+                'line_number': error.line_number,
+                'error': error.message,
+                'code': error.code,
+                'field': error.field,
+                }, sort_keys=True)
+    elif error.line_number is None:
+        text = "{0}: {1}".format(path, error.message)
     else:
-            print(unicode(ob))
+        text = "{0}:{1}: {2}".format(path, error.line_number, error.message)
+    return (text + "\n").encode('utf8')
+
+
+def _format_record(path, line, record, as_json):
+    if as_json:
+        fields = dict(zip(
+                record._attribute_names, record._get_values(record)))
+        line_number = fields.pop('line_number')
+        text = json.dumps({
+                'file': path,
+                'line_number': line_number,
+                'record': fields,
+                }, sort_keys=True)
+    else:
+        text = line
+    return (text + "\n").encode('utf8')
+
+
+def _cat_in_parallel(paths, output, as_json, errors_only, jobs):
+    """Like _cat() for each path, with a pool of jobs processes (None
+    means the number of CPUs). Each process writes the output of a file
+    to a temporary file, that is copied to output when all the files
+    before it are done, so that the output is in the same order as
+    without jobs. Yields the number of errors of each file."""
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    try:
+        results = pool.imap(
+            _cat_to_temporary_file,
+            [(path, as_json, errors_only) for path in paths])
+        for temporary_path, error_count in results:
+            try:
+                with open(temporary_path, 'rb') as temporary_file:
+                    shutil.copyfileobj(temporary_file, output)
+            finally:
+                os.remove(temporary_path)
+            yield error_count
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _cat_to_temporary_file(arguments):
+    # Module level function, so that it can be used by the process pool
+    path, as_json, errors_only = arguments
+    handle, temporary_path = tempfile.mkstemp(prefix='sufribcat')
+    with os.fdopen(handle, 'wb') as temporary_file:
+        error_count = _cat(path, temporary_file, as_json, errors_only)
+    return temporary_path, error_count
+
+
+def sufribbench():
+    parser = argparse.ArgumentParser(
+ description="Benchmark parsing SUFRIB 2.1 files, print the results as "
+             "one JSON object per line.")
+    parser.add_argument(
+        "filenames", nargs="*",
+        help="Files to parse (default: the .RIB and .RMB files in data/)")
+    parser.add_argument(
+        "--scales", type=int, nargs="+", default=[1, 10, 100],
+        help="Also parse the files with their lines repeated this many "
+             "times (default: 1 10 100)")
+    parser.add_argument(
+        "--repeat", type=int, default=1,
+        help="Parse each file this many times, report the best time")
+
+    args = parser.parse_args()
+
+    from . import benchmark
+    paths = args.filenames or benchmark.data_files()
+
+    for result in benchmark.run(paths, args.scales, args.repeat):
+        print(json.dumps(result, sort_keys=True))
+        sys.stdout.flush()
@@ -0,0 +1,292 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Spatial index of manholes and sewers, in RD coordinates.
+
+See RIB21.manhole_index() and RIB21.sewer_index(); SpatialIndex can also
+be built from any (value, point or segment) pairs."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import heapq
+import math
+
+# Items whose bounding box touches more grid cells than this aren't put
+# in the grid, but in a list of long items that every query looks at.
+# Those are few (a sewer to a manhole with a wrong coordinate), and
+# would otherwise fill a lot of cells.
+MAX_CELLS_PER_ITEM = 16
+
+# The part of the points that is left out at both sides when the default
+# cell size is computed from the extent of the points, so that a few far
+# away points (a coordinate typo, a manhole at (0, 0)) don't count.
+OUTLIER_FRACTION = 0.05
+
+
+class SpatialIndex(object):
+    """Uniform grid over segments (a point is a segment of length 0).
+    Each item is registered in every grid cell its bounding box touches,
+    a query only looks at the items in the cells it touches (and the
+    long items, see MAX_CELLS_PER_ITEM).
+
+    Items are given as (value, (x1, y1, x2, y2)) pairs; queries return
+    the values. The cell size defaults to about two items per cell if
+    they were spread evenly over the extent of most of the points (see
+    OUTLIER_FRACTION), or the median segment length, whichever is
+    larger."""
+
+    def __init__(self, items, cell_size=None):
+        self._values = []
+        self._segments = []
+        for value, segment in items:
+            self._values.append(value)
+            self._segments.append(tuple(float(c) for c in segment))
+
+        if cell_size is None:
+            cell_size = self._default_cell_size()
+        self.cell_size = cell_size
+
+        self._cells = {}  # (column, row) -> list of item numbers
+        self._long = []  # Numbers of the items that aren't in _cells
+        self._min_cell = self._max_cell = None
+        for number, (x1, y1, x2, y2) in enumerate(self._segments):
+            self._add(number, min(x1, x2), min(y1, y2),
+                      max(x1, x2), max(y1, y2))
+        if self._min_cell is None:
+            self._min_cell = self._max_cell = (0, 0)
+
+    def __len__(self):
+        return len(self._values)
+
+    def _default_cell_size(self):
+        if not self._segments:
+            return 1.0
+        xs = sorted(x for (x1, _, x2, _) in self._segments for x in (x1, x2))
+        ys = sorted(y for (_, y1, _, y2) in self._segments for y in (y1, y2))
+        area = ((_percentile(xs, 1 - OUTLIER_FRACTION) -
+                 _percentile(xs, OUTLIER_FRACTION)) *
+                (_percentile(ys, 1 - OUTLIER_FRACTION) -
+                 _percentile(ys, OUTLIER_FRACTION)))
+        median_length = _percentile(sorted(
+                math.hypot(x2 - x1, y2 - y1)
+                for (x1, y1, x2, y2) in self._segments), 0.5)
+        return max(math.sqrt(2 * area / len(self._segments)),
+                   median_length, 1.0)
+
+    def _cell(self, x, y):
+        return (int(math.floor(x / self.cell_size)),
+                int(math.floor(y / self.cell_size)))
+
+    def _add(self, number, xmin, ymin, xmax, ymax):
+        (column_min, row_min) = self._cell(xmin, ymin)
+        (column_max, row_max) = self._cell(xmax, ymax)
+        if ((column_max - column_min + 1) * (row_max - row_min + 1) >
+                MAX_CELLS_PER_ITEM):
+            self._long.append(number)
+            return
+        for column in range(column_min, column_max + 1):
+            for row in range(row_min, row_max + 1):
+                self._cells.setdefault((column, row), []).append(number)
+        if self._min_cell is None:
+            self._min_cell = (column_min, row_min)
+            self._max_cell = (column_max, row_max)
+        else:
+            self._min_cell = (min(self._min_cell[0], column_min),
+                              min(self._min_cell[1], row_min))
+            self._max_cell = (max(self._max_cell[0], column_max),
+                              max(self._max_cell[1], row_max))
+
+    def _candidates(self, xmin, ymin, xmax, ymax):
+        """Return the numbers of the items in the cells that the box
+        touches and of the long items, sorted."""
+        (column_min, row_min) = self._cell(xmin, ymin)
+        (column_max, row_max) = self._cell(xmax, ymax)
+        # Don't loop over empty cells outside of the grid
+        column_min = max(column_min, self._min_cell[0])
+        row_min = max(row_min, self._min_cell[1])
+        column_max = min(column_max, self._max_cell[0])
+        row_max = min(row_max, self._max_cell[1])
+
+        cells = self._cells
+        candidates = set(self._long)
+        if ((column_max - column_min + 1) * (row_max - row_min + 1) >
+                len(cells)):
+            # Mostly empty cells (the grid is stretched by a few far away
+            # items), look at the cells with items instead
+            for (column, row), numbers in cells.items():
+                if (column_min <= column <= column_max and
+                        row_min <= row <= row_max):
+                    candidates.update(numbers)
+            return sorted(candidates)
+        for column in range(column_min, column_max + 1):
+            for row in range(row_min, row_max + 1):
+                numbers = cells.get((column, row))
+                if numbers is not None:
+                    candidates.update(numbers)
+        return sorted(candidates)
+
+    def bbox(self, xmin, ymin, xmax, ymax):
+        """Return the values of the items that are (partly) inside the
+        box, in the order in which they were given."""
+        segments = self._segments
+        values = self._values
+        result = []
+        for number in self._candidates(xmin, ymin, xmax, ymax):
+            x1, y1, x2, y2 = segments[number]
+            if ((xmin <= x1 <= xmax and ymin <= y1 <= ymax) or
+                    _segment_intersects_box(
+                    x1, y1, x2, y2, xmin, ymin, xmax, ymax)):
+                result.append(values[number])
+        return result
+
+    def within(self, x, y, radius):
+        """Return the values of the items at most radius away from
+        (x, y), nearest first."""
+        segments = self._segments
+        found = []
+        for number in self._candidates(
+                x - radius, y - radius, x + radius, y + radius):
+            distance = _distance_to_segment(x, y, *segments[number])
+            if distance <= radius:
+                found.append((distance, number))
+        found.sort()
+        return [self._values[number] for (_, number) in found]
+
+    def nearest(self, x, y, k=1):
+        """Return the k items nearest to (x, y) as (value, distance)
+        tuples, nearest first.
+
+        Searches rings of cells around (x, y) until the k-th nearest item
+        found so far is nearer than anything outside the searched
+        square can be. Once a ring has more cells than there are cells
+        with items, the cells with items are searched instead."""
+        if k <= 0 or not self._values:
+            return []
+
+        segments = self._segments
+        cell_size = self.cell_size
+        (column, row) = self._cell(x, y)
+        max_ring = max(
+            abs(column - self._min_cell[0]), abs(column - self._max_cell[0]),
+            abs(row - self._min_cell[1]), abs(row - self._max_cell[1]))
+
+        seen = set()
+        best = []  # Heap of (-distance, -number), the k nearest so far
+
+        def add(numbers):
+            for number in numbers:
+                if number in seen:
+                    continue
+                seen.add(number)
+                item = (-_distance_to_segment(x, y, *segments[number]),
+                        -number)
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+        add(self._long)
+        ring = 0
+        while ring <= max_ring:
+            if 8 * ring > len(self._cells):
+                for numbers in self._cells.values():
+                    add(numbers)
+                break
+            for cell in _ring_cells(column, row, ring):
+                add(self._cells.get(cell, ()))
+
+            # Nearest possible distance of items in cells not searched yet
+            searched = min(
+                x - (column - ring) * cell_size,
+                (column + ring + 1) * cell_size - x,
+                y - (row - ring) * cell_size,
+                (row + ring + 1) * cell_size - y)
+            if len(best) == k and -best[0][0] <= searched:
+                break
+            ring += 1
+
+        return [(self._values[-number], -distance)
+                for (distance, number) in sorted(best, reverse=True)]
+
+
+def _percentile(values, fraction):
+    """The value at fraction of the way through values, which are
+    sorted (without interpolation)."""
+    return values[int(round(fraction * (len(values) - 1)))]
+
+
+def _ring_cells(column, row, ring):
+    """The cells at exactly ring cells from (column, row)."""
+    if ring == 0:
+        return [(column, row)]
+    cells = []
+    for i in range(-ring, ring + 1):
+        cells.append((column + i, row - ring))
+        cells.append((column + i, row + ring))
+    for i in range(-ring + 1, ring):
+        cells.append((column - ring, row + i))
+        cells.append((column + ring, row + i))
+    return cells
+
+
+def _segment_intersects_box(x1, y1, x2, y2, xmin, ymin, xmax, ymax):
+    """Liang-Barsky: clip the segment to the box, and see if anything
+    is left."""
+    t0, t1 = 0.0, 1.0
+    dx = x2 - x1
+    dy = y2 - y1
+    for p, q in ((-dx, x1 - xmin), (dx, xmax - x1),
+                 (-dy, y1 - ymin), (dy, ymax - y1)):
+        if p == 0:
+            if q < 0:  # Parallel to this side, and outside of it
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return False
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return False
+                t1 = min(t1, t)
+    return True
+
+
+def _distance_to_segment(x, y, x1, y1, x2, y2):
+    dx = x2 - x1
+    dy = y2 - y1
+    length_squared = dx * dx + dy * dy
+    if length_squared == 0:
+        return math.hypot(x - x1, y - y1)
+    t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length_squared))
+    return math.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+
+def manhole_index(rib, cell_size=None):
+    """Return a SpatialIndex of the *PUT lines of rib that have an RD
+    point (CAB)."""
+    return SpatialIndex(
+        ((line, line.rd_point + line.rd_point)
+         for line in rib.lines_of_type('*PUT')
+         if line.rd_point is not None),
+        cell_size)
+
+
+def sewer_index(rib, cell_size=None):
+    """Return a SpatialIndex of the *RIOO lines of rib, as the segment
+    between their manholes' RD points (AAE and AAG). If only one of
+    those is known, the sewer is indexed as that point."""
+    def items():
+        for line in rib.lines_of_type('*RIOO'):
+            point1 = line.manhole1_rd_point
+            point2 = line.manhole2_rd_point
+            if point1 is None and point2 is None:
+                continue
+            yield line, (point1 or point2) + (point2 or point1)
+
+    return SpatialIndex(items(), cell_size)
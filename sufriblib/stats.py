@@ -0,0 +1,195 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Statistics about a parse, see parsers.parse()."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import timeit
+
+from . import sufrib
+from .errors import ErrorSummary
+
+clock = timeit.default_timer
+
+# Error kinds, by error code (see errors.MESSAGES). Errors of a line
+# class's check() and others are kind 'check'.
+ERROR_KINDS = {
+    'field_count': 'field_count',
+    'field_length': 'field_length',
+    'field_format': 'field_format',
+    'record_type': 'record_type',
+    'file_missing': 'file',
+    'file_error': 'file',
+    }
+
+
+def error_kind(error):
+    """Return what kind of error this is, see ERROR_KINDS."""
+    return ERROR_KINDS.get(error.code, 'check')
+
+
+class ParseStats(object):
+    """Where the time of a parse went. Pass one to parsers.parse() or
+    parse_collecting_errors() and read it afterwards:
+
+    - phases: seconds spent reading the file (including the clean up of
+      characters and line endings), parsing correct lines, handling lines
+      with errors (parsing them again with the reference parser and
+      formatting the messages), and in total
+    - record_types: per record type, the number of lines, the seconds
+      spent on them and the number of lines with errors
+    - errors: the number of errors per kind, see error_kind()
+    - cached: whether the result came from a cache.ParseCache
+
+    With several workers, the phases other than 'total' are summed over
+    the worker processes.
+
+    Blocks of lines are timed as a whole, and only the lines that need
+    the full parse are timed one by one, so the overhead is a few
+    percent. With a columnar RMB21, the *MRIO lines with errors count as
+    'parse'. Hooks are called with this object when the parse is
+    finished, to forward the numbers to some other system (as_dict()
+    gives all of them)."""
+
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.phases = {'read': 0.0, 'parse': 0.0, 'errors': 0.0, 'total': 0.0}
+        self.errors = {}
+        self.cached = False
+        # The first 5 characters of a line -> [lines, seconds, errors]
+        self._lines = {}
+
+    def timed_blocks(self, blocks):
+        """Yield from blocks, adding the time each takes to the 'read'
+        phase."""
+        blocks = iter(blocks)
+        while True:
+            start = clock()
+            try:
+                block = next(blocks)
+            except StopIteration:
+                self.phases['read'] += clock() - start
+                return
+            self.phases['read'] += clock() - start
+            yield block
+
+    def add_lines(self, add_lines, add_line, lines, line_number, errors):
+        """Add a block of lines with add_lines(line_number, lines, errors,
+        add_line), see SUFRIB21.add_lines(), and time it as a whole. The
+        lines it doesn't parse itself are passed to add_line and timed
+        one by one; the time of those that have errors is the 'errors'
+        phase. Returns the line number of the next line.
+
+        Time per record type is that of those lines, plus the rest of
+        the block's time divided over its lines."""
+        slow_seconds = {}  # First 5 characters -> seconds in add_line
+        error_seconds = [0.0]
+
+        def timed_add_line(line_number, line, errorlist):
+            error_count = len(errorlist)
+            start = clock()
+            add_line(line_number, line, errorlist)
+            seconds = clock() - start
+            slow_seconds[line[:5]] = slow_seconds.get(line[:5], 0.0) + seconds
+            if len(errorlist) != error_count:
+                error_seconds[0] += seconds
+
+        block_errors = []
+        start = clock()
+        next_line_number = add_lines(
+            line_number, lines, block_errors, timed_add_line)
+        seconds = clock() - start
+        errors += block_errors
+
+        # All record types are recognizable by their first 5 characters,
+        # that's cheaper than splitting the lines.
+        by_start = self._lines
+        starts = [line[:5] for line in lines]
+        seconds_per_line = (
+            (seconds - sum(slow_seconds.values())) / max(len(lines), 1))
+        for line_start in set(starts):
+            line_count = starts.count(line_start)
+            counts = by_start.get(line_start)
+            if counts is None:
+                counts = by_start[line_start] = [0, 0.0, 0]
+            counts[0] += line_count
+            counts[1] += (seconds_per_line * line_count +
+                          slow_seconds.get(line_start, 0.0))
+        for error_line_number in set(
+                error.line_number for error in block_errors):
+            by_start[starts[error_line_number - line_number]][2] += 1
+
+        self.phases['parse'] += seconds - error_seconds[0]
+        self.phases['errors'] += error_seconds[0]
+        return next_line_number
+
+    def merge(self, other):
+        """Add the numbers of other, the stats of another part of the
+        same file."""
+        for phase, seconds in other.phases.items():
+            if phase != 'total':
+                self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        for start, counts in other._lines.items():
+            own_counts = self._lines.setdefault(start, [0, 0.0, 0])
+            for i, count in enumerate(counts):
+                own_counts[i] += count
+
+    def finish(self, errors, seconds):
+        """Called by the parser with all errors (a list or an
+        errors.ErrorSummary) and the total time."""
+        self.phases['total'] = seconds
+        if isinstance(errors, ErrorSummary):
+            counts = errors.counts().items()
+        else:
+            counts = (((error.code, error.field), 1) for error in errors)
+        for (code, _), count in counts:
+            kind = ERROR_KINDS.get(code, 'check')
+            self.errors[kind] = self.errors.get(kind, 0) + count
+        for hook in self.hooks:
+            hook(self)
+
+    @property
+    def record_types(self):
+        record_types = {}
+        for start, (lines, seconds, errors) in self._lines.items():
+            if isinstance(start, bytes):  # Lazily parsed
+                start = start.decode('ascii')
+            record_type = start.partition('|')[0].strip()
+            if record_type not in sufrib.SUFRIB21.LINE_CLASSES:
+                record_type = 'other'
+            counts = record_types.setdefault(
+                record_type, {'lines': 0, 'seconds': 0.0, 'errors': 0})
+            counts['lines'] += lines
+            counts['seconds'] += seconds
+            counts['errors'] += errors
+        return record_types
+
+    @property
+    def lines(self):
+        return sum(counts[0] for counts in self._lines.values())
+
+    def slowest_line_classes(self, n=3):
+        """Return the n line classes that took the most time per line,
+        as (class name, seconds per line) tuples, slowest first."""
+        per_line = [
+            (sufrib.SUFRIB21.LINE_CLASSES[record_type].__name__,
+             counts['seconds'] / counts['lines'])
+            for record_type, counts in self.record_types.items()
+            if record_type != 'other']
+        per_line.sort(key=lambda item: item[1], reverse=True)
+        return per_line[:n]
+
+    def as_dict(self):
+        return {
+            'phases': dict(self.phases),
+            'record_types': self.record_types,
+            'errors': dict(self.errors),
+            'lines': self.lines,
+            'cached': self.cached,
+            'slowest_line_classes': self.slowest_line_classes(),
+            }
@@ -11,14 +11,837 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 
+import array
+import operator
+import re
+
+try:
+    from itertools import izip as _izip
+except ImportError:  # Python 3
+    _izip = zip
+
 from . import util
 from .errors import Error
+from .errors import LineError
+
+
+# Source for the inlined conversion of each format in compile_parser().
+# They raise ValueError if the field isn't correct, the compiled parser
+# then lets RibLine.parse() produce the error message.
+CONVERTERS = {
+    None: "{field}",
+    'float': "float({field})",
+    'int': "int({field})",
+    'stripped_string': "{field}.strip()",
+    '######.##/######.##': "_coordinate({field})",
+    }
+
+
+def _coordinate(field):
+    """Compiled version of check_format's '######.##/######.##'."""
+    x, y = field.split("/")  # ValueError if not exactly two parts
+    if not x or not y:
+        raise ValueError(field)
+    return (float(x), float(y))
+
+
+def line_regex(fields, blank_as_none=False):
+    """Return a compiled regular expression that matches a line with
+    exactly the given FIELDS, with one group per field. Only printable
+    ASCII is allowed in the fields. If blank_as_none, the group of a
+    field that is all spaces is None."""
+    if blank_as_none:
+        # Printable ASCII except '|', but all spaces isn't captured. The
+        # lookahead keeps the branches apart; otherwise a line that
+        # doesn't match would be tried both ways for every blank field.
+        field = '(?: {{{0}}}|(?! {{{0}}})([ -{{}}~]{{{0}}}))'
+    else:
+        field = '([ -{{}}~]{{{0}}})'
+    return re.compile(r'\|'.join(
+        field.format(length) for (_, length, _) in fields) + r'\Z')
+
+
+def _bytes_coordinate(field):
+    """_coordinate() for byte strings."""
+    x, y = field.split(b"/")
+    if not x or not y:
+        raise ValueError(field)
+    return (float(x), float(y))
+
+
+def compile_parser(fields):
+    """Return a parse(self, line_number, line) function specialised for
+    the given FIELDS tuple.
+
+    The generated function matches the line against a regular expression
+    built from the field widths, so the column offsets of all fields are
+    checked and the fields sliced out in one go, and then sets every
+    attribute with an inlined converter. The expression only allows
+    printable ASCII, so a blank field is recognized by comparing it to a
+    string of that many spaces.
+
+    It only handles correct lines; as soon as anything is wrong, it
+    hands the line to the generic RibLine.parse(), so the error messages
+    are exactly the same."""
+    if any(format not in CONVERTERS for (_, _, format) in fields):
+        return RibLine.parse
+
+    names = ['f{0}'.format(i) for i in range(len(fields))]
+
+    source = [
+        "def parse(self, line_number, line):",
+        "    self.line_number = line_number",
+        "    match = _match(line)",
+        "    if match is None:",
+        "        return _parse(self, line_number, line)",
+        "    {0}, = match.groups()".format(", ".join(names)),
+        "    try:",
+        ]
+    for name, (fieldname, length, format) in zip(names, fields):
+        source.append(
+            "        self.{attr} = None if {field} == {blank!r} else {value}"
+            .format(attr=fieldname, field=name, blank=" " * length,
+                    value=CONVERTERS[format].format(field=name)))
+    source += [
+        "    except ValueError:",
+        "        return _parse(self, line_number, line)",
+        "    return self.check()",
+        ]
+
+    namespace = {
+        '_parse': RibLine.parse,
+        '_match': line_regex(fields).match,
+        '_coordinate': _coordinate,
+        }
+    exec("\n".join(source), namespace)
+    parse = namespace['parse']
+    parse.fields = fields  # See compile_correct_parser()
+    return parse
+
+
+def compile_correct_parser(line_class):
+    """Return a parse_correct(line_number, line) function for the given
+    line class, that returns a line object if the line is completely
+    correct, and None if parse() would give any error (or if the line
+    has unprintable characters, which the expression doesn't match).
+
+    It is the fast path of parsing: the line is matched like in
+    compile_parser(), but the expression already gives None for blank
+    fields. line_class.REQUIRED and line_class.CHOICES are checked on
+    those groups, and then the object is made and all its attributes
+    set in one tuple assignment. If check() isn't described by REQUIRED
+    and CHOICES (see _check_is_declared()), it is called instead. Lines
+    that aren't correct are left to parse(), which gives the errors."""
+    fields = line_class.FIELDS
+    if not fields or getattr(line_class.parse, 'fields', None) != fields:
+        # Not the compiled parse() of these FIELDS, only parse() knows
+        # what is correct
+        return lambda line_number, line: None
+
+    names = ['f{0}'.format(i) for i in range(len(fields))]
+    field_names = dict(
+        (fieldname, name) for name, (fieldname, _, _) in zip(names, fields))
+    namespace = {
+        '_match': line_regex(fields, blank_as_none=True).match,
+        '_new': object.__new__,
+        '_class': line_class,
+        '_coordinate': _coordinate,
+        }
 
+    source = [
+        "def parse_correct(line_number, line):",
+        "    match = _match(line)",
+        "    if match is None:",
+        "        return None",
+        "    {0}, = match.groups()".format(", ".join(names)),
+        ]
+    check_is_declared = _check_is_declared(line_class)
+    if check_is_declared:
+        conditions = [
+            "{0} is None".format(field_names[fieldname])
+            for fieldname in line_class.REQUIRED]
+        for fieldname, values in sorted(line_class.CHOICES.items()):
+            namespace['_choices_' + fieldname] = frozenset(values)
+            conditions.append(
+                "({0} is not None and {0} not in _choices_{1})".format(
+                    field_names[fieldname], fieldname))
+        if conditions:
+            source += [
+                "    if {0}:".format(" or ".join(conditions)),
+                "        return None",
+                ]
 
-class RibLine(object):
+    source += [
+        "    self = _new(_class)",
+        "    try:",
+        "        (self.line_number,",
+        ]
+    source += ["         self.{0},".format(fieldname)
+               for (fieldname, _, _) in fields]
+    source.append("         ) = (line_number,")
+    for name, (_, _, format) in zip(names, fields):
+        if format is None:
+            source.append("              {0},".format(name))
+        else:
+            source.append(
+                "              None if {0} is None else {1},".format(
+                    name, CONVERTERS[format].format(field=name)))
+    source += [
+        "              )",
+        "    except ValueError:",
+        "        return None",
+        ]
+    if not check_is_declared:
+        source += [
+            "    if self.check():",
+            "        return None",
+            ]
+    source.append("    return self")
+
+    exec("\n".join(source), namespace)
+    return namespace['parse_correct']
+
+
+def _check_is_declared(line_class):
+    """Whether everything check() checks is in line_class.REQUIRED and
+    line_class.CHOICES: the class that defines check() is RibLine, or it
+    defines REQUIRED or CHOICES itself."""
+    for klass in line_class.__mro__:
+        if 'check' in klass.__dict__:
+            return (klass is RibLine or 'REQUIRED' in klass.__dict__ or
+                    'CHOICES' in klass.__dict__)
+    return False
+
+
+# Translation table for compile_validator(): printable ASCII becomes 'x',
+# except '|', which stays. Other characters become '\0'.
+_SIGNATURE = bytes(bytearray(
+        ord('|') if i == ord('|') else ord('x') if 32 <= i < 127 else 0
+        for i in range(256)))
+
+
+def compile_validator(line_class):
+    """Return a function validate_line(line) for the given line class,
+    that returns True if parsing the line would give no errors, without
+    making a line object. Line is a byte string, as read from the file
+    with non-ASCII characters replaced (see parsers.validate()).
+
+    Field widths are checked by translating the line to its signature
+    (the positions of the '|'s) and comparing that to the precomputed
+    one; lines with unprintable characters don't match it. Then only the
+    fields that have a format are converted, and line_class.REQUIRED and
+    line_class.CHOICES are checked.
+
+    False means there may be an error; the line needs to be parsed to
+    find out which. That is always the answer if parse() isn't the
+    compiled one of these FIELDS or check() isn't described by REQUIRED
+    and CHOICES, like in compile_correct_parser()."""
+    fields = line_class.FIELDS
+    if (not fields or
+            any(format not in CONVERTERS for (_, _, format) in fields) or
+            getattr(line_class.parse, 'fields', None) != fields or
+            not _check_is_declared(line_class)):
+        return lambda line: False
+
+    namespace = {
+        '_table': _SIGNATURE,
+        '_signature': b'|'.join(b'x' * length for (_, length, _) in fields),
+        '_coordinate': _bytes_coordinate,
+        }
+    slices = {}
+    blanks = {}
+    start = 0
+    for (fieldname, length, _) in fields:
+        slices[fieldname] = "line[{0}:{1}]".format(start, start + length)
+        blanks[fieldname] = "_blank{0}".format(length)
+        namespace[blanks[fieldname]] = b' ' * length
+        start += length + 1
+
+    source = [
+        "def validate_line(line):",
+        "    if line.translate(_table) != _signature:",
+        "        return False",
+        ]
+    conversions = []
+    for fieldname, _, format in fields:
+        if format is not None:
+            conversions += [
+                "        field = {0}".format(slices[fieldname]),
+                "        if field != {0}: {1}".format(
+                    blanks[fieldname],
+                    CONVERTERS[format].format(field="field")),
+                ]
+    if conversions:
+        source += ["    try:"] + conversions + [
+            "    except ValueError:",
+            "        return False",
+            ]
+    source.append("    return (True")
+    for fieldname in line_class.REQUIRED:
+        source.append("        and {0} != {1}".format(
+                slices[fieldname], blanks[fieldname]))
+    for fieldname, values in sorted(line_class.CHOICES.items()):
+        namespace['_choices_' + fieldname] = tuple(
+            value.encode('ascii') for value in values)
+        source.append(
+            "        and ({0} == {1} or {0} in _choices_{2})".format(
+                slices[fieldname], blanks[fieldname], fieldname))
+    source.append("        )")
+
+    exec("\n".join(source), namespace)
+    return namespace['validate_line']
+
+
+# Source for decoding a field of a lazily parsed line, which is a byte
+# string, in compile_lazy_class().
+LAZY_CONVERTERS = {
+    None: "{field}.decode('ascii')",
+    'float': "float({field})",
+    'int': "int({field})",
+    'stripped_string': "{field}.strip().decode('ascii')",
+    '######.##/######.##': "_coordinate({field})",
+    }
+
+
+def compile_lazy_class(line_class):
+    """Return a subclass of line_class whose instances keep the raw line
+    and only decode a field when it is first read, see _LazyLine.
+
+    Each field becomes a property that slices the field out of the line
+    at its precomputed offset, converts it like parse() would, and
+    caches the value in line_class's slot for that field."""
+    namespace = {
+        '__slots__': (str('_raw'), str('_checked'), str('_edited')),
+        '__doc__': "Lazily parsed {0}.".format(line_class.__name__),
+        '_eager_class': line_class,
+        '_match': re.compile(
+            line_regex(line_class.FIELDS).pattern.encode('ascii')).match,
+        }
+    start = 0
+    for fieldname, length, format in line_class.FIELDS:
+        member = getattr(line_class, fieldname)  # The slot
+        source = [
+            "def get(self):",
+            "    try:",
+            "        return _cached(self)",
+            "    except AttributeError:",
+            "        if not self._checked and not self._check_layout():",
+            "            return self._fallback(_cached)",
+            "    field = self._raw[{0}:{1}]".format(start, start + length),
+            "    try:",
+            "        value = None if field == _blank else {0}".format(
+                LAZY_CONVERTERS[format].format(field="field")),
+            "    except ValueError:",
+            "        return self._fallback(_cached)",
+            "    _store(self, value)",
+            "    return value",
+            ]
+        field_namespace = {
+            '_cached': member.__get__,
+            '_store': member.__set__,
+            '_blank': b' ' * length,
+            '_coordinate': _bytes_coordinate,
+            }
+        source += [
+            "def set(self, value):",
+            "    _store(self, value)",
+            "    self._edited = True",
+            ]
+        exec("\n".join(source), field_namespace)
+        namespace[fieldname] = property(
+            field_namespace['get'], field_namespace['set'])
+        start += length + 1
+
+    return RibLineType(
+        str('Lazy' + line_class.__name__), (_LazyLine, line_class), namespace)
+
+
+# Source for formatting the value of a field in compile_formatter(), the
+# inverse of CONVERTERS. Fields without a format are kept verbatim by
+# parse(), so they come out exactly as they were read.
+FORMATTERS = {
+    None: "{value}",
+    'float': "_float({value}, {length})",
+    'int': "'{{0:d}}'.format({value})",
+    'stripped_string': "{value}",
+    '######.##/######.##': "_coordinate({value}, {length})",
+    }
+
+
+def _format_float(value, length):
+    """The shortest text that float() turns into value, without '.0' for
+    whole numbers. If that doesn't fit in length characters, value is
+    rounded to as many decimals as do fit."""
+    text = "{0!r}".format(value)
+    if text.endswith(".0"):
+        text = text[:-2]
+    if len(text) > length:
+        decimals = length - len("{0:.0f}".format(value)) - 1
+        if decimals >= 0:
+            text = "{0:.{1}f}".format(value, decimals)
+    return text
+
+
+def _format_coordinate(value, length):
+    """Format an (x, y) tuple like '######.##/######.##'."""
+    width = (length - 1) // 2
+    return "{0:{2}.2f}/{1:{2}.2f}".format(value[0], value[1], width)
+
+
+def _fit(text, length, fieldname):
+    """Pad text with spaces to length characters, or raise ValueError if
+    it is longer."""
+    if len(text) > length:
+        raise ValueError(
+            "Veld {fieldname} mag {length} tekens lang zijn, '{text}' "
+            "is te lang.".format(fieldname=fieldname, length=length,
+                                 text=text))
+    return text.ljust(length)
+
+
+def format_field(value, length, format, fieldname):
+    """Return the text of a field with this value, as in FIELDS. None
+    becomes a blank field. Raises ValueError if it doesn't fit. This is
+    the reference implementation of compile_formatter()."""
+    if value is None:
+        return " " * length
+    if format == 'float':
+        text = _format_float(value, length)
+    elif format == 'int':
+        text = "{0:d}".format(value)
+    elif format == "######.##/######.##":
+        text = _format_coordinate(value, length)
+    else:
+        text = value
+    return _fit(text, length, fieldname)
+
+
+def compile_formatter(fields):
+    """Return a format_line(self) function specialised for the given
+    FIELDS tuple, that returns the line as it is written in a file
+    (without line ending). The inverse of compile_parser(); see
+    format_field() for how values are formatted.
+
+    Raises ValueError if a value doesn't fit in its field, and
+    AttributeError if the line wasn't (completely) parsed."""
+    names = ['f{0}'.format(i) for i in range(len(fields))]
+    source = [
+        "def format_line(self):",
+        "    {0}, = _get(self)".format(", ".join(names)),
+        ]
+    for name, (fieldname, length, format) in zip(names, fields):
+        source += [
+            "    if {0} is None:".format(name),
+            "        {0} = {1!r}".format(name, " " * length),
+            "    else:",
+            ]
+        if format is not None:
+            source.append("        {0} = {1}".format(
+                    name, FORMATTERS[format].format(
+                        value=name, length=length)))
+        source += [
+            "        if len({0}) != {1}:".format(name, length),
+            "            {0} = _fit({0}, {1}, {2!r})".format(
+                name, length, fieldname),
+            ]
+    source.append("    return '|'.join(({0},))".format(", ".join(names)))
+
+    namespace = {
+        '_get': _tuple_getter(
+            tuple(fieldname for (fieldname, _, _) in fields)),
+        '_fit': _fit,
+        '_float': _format_float,
+        '_coordinate': _format_coordinate,
+        }
+    exec("\n".join(source), namespace)
+    return namespace['format_line']
+
+
+def compile_line_builder(line_class):
+    """Return a function build_lines(values, codes) that makes lines of
+    line_class from columns of values (see _pack_lines()). For
+    each attribute (see _attribute_names), values has a tuple of values
+    and codes the indexes in it of the value of each line."""
+    names = line_class._attribute_names
+    value_names = ['v{0}'.format(i) for i in range(len(names))]
+    code_names = ['c{0}'.format(i) for i in range(len(names))]
+    source = [
+        "def build_lines(values, codes):",
+        "    {0}, = values".format(", ".join(value_names)),
+        "    lines = []",
+        "    append = lines.append",
+        "    for {0}, in _izip(*codes):".format(", ".join(code_names)),
+        "        self = _new(_class)",
+        ]
+    source += [
+        "        self.{0} = {1}[{2}]".format(name, value_name, code_name)
+        for name, value_name, code_name in zip(
+            names, value_names, code_names)]
+    source += [
+        "        append(self)",
+        "    return lines",
+        ]
+
+    namespace = {
+        '_izip': _izip,
+        '_new': object.__new__,
+        '_class': line_class,
+        }
+    exec("\n".join(source), namespace)
+    return namespace['build_lines']
+
+
+class _CompiledOnFirstUse(object):
+    """Class attribute of a line class that is compiled by
+    compile(line_class) when it is first used, and is then replaced by
+    the result. Importing sufriblib then doesn't compile the parsers,
+    validators, formatters and lazy classes of all line classes, only
+    those of the record types that are actually used."""
+
+    def __init__(self, line_class, name, compile):
+        self.line_class = line_class
+        self.name = name
+        self.compile = compile
+
+    def __get__(self, instance, owner):
+        setattr(self.line_class, self.name, self.compile(self.line_class))
+        if instance is None:
+            return getattr(owner, self.name)
+        return getattr(instance, self.name)
+
+
+def _compile_parser(line_class):
+    return compile_parser(line_class.FIELDS)
+
+
+def _compile_formatter(line_class):
+    return compile_formatter(line_class.FIELDS)
+
+
+def _compile_correct_parser(line_class):
+    return staticmethod(compile_correct_parser(line_class))
+
+
+def _compile_validator(line_class):
+    return staticmethod(compile_validator(line_class))
+
+
+def _compile_line_builder(line_class):
+    return staticmethod(compile_line_builder(line_class))
+
+
+class RibLineType(type):
+    """Metaclass of the line classes. A class that defines its own FIELDS
+    gets __slots__ for them, so that instances have no __dict__, and
+    (unless it defines its own parse()) a parse() method compiled from
+    those FIELDS, see compile_parser(), and likewise a format_line()
+    method, see compile_formatter(). Those and validate_line() and
+    lazy_class are compiled on first use, see _CompiledOnFirstUse.
+
+    Every class gets its own parse_correct() (see
+    compile_correct_parser()), validate_line() and lazy_class, as a
+    subclass may check more than the class it inherits from."""
+    def __new__(mcs, name, bases, namespace):
+        if 'FIELDS' in namespace and '__slots__' not in namespace:
+            inherited = set()
+            for base in bases:
+                for klass in base.__mro__:
+                    inherited.update(klass.__dict__.get('__slots__', ()))
+            namespace['__slots__'] = tuple(
+                str(fieldname) for (fieldname, _, _) in namespace['FIELDS']
+                if fieldname not in inherited)
+        return super(RibLineType, mcs).__new__(mcs, name, bases, namespace)
+
+    def __init__(cls, name, bases, namespace):
+        super(RibLineType, cls).__init__(name, bases, namespace)
+        if 'FIELDS' in namespace:
+            cls._attribute_names = ('line_number',) + tuple(
+                fieldname for (fieldname, _, _) in cls.FIELDS)
+            cls._get_values = staticmethod(
+                _tuple_getter(cls._attribute_names))
+            cls._set_values = _tuple_setter(cls._attribute_names)
+            if 'parse' not in namespace:
+                cls.parse = _CompiledOnFirstUse(
+                    cls, 'parse', _compile_parser)
+            if 'format_line' not in namespace and all(
+                    format in FORMATTERS for (_, _, format) in cls.FIELDS):
+                cls.format_line = _CompiledOnFirstUse(
+                    cls, 'format_line', _compile_formatter)
+        if getattr(cls, 'FIELDS', None):
+            cls._build_lines = _CompiledOnFirstUse(
+                cls, '_build_lines', _compile_line_builder)
+            if 'lazy_class' not in namespace and all(
+                    format in LAZY_CONVERTERS for (_, _, format) in cls.FIELDS):
+                cls.lazy_class = _CompiledOnFirstUse(
+                    cls, 'lazy_class', compile_lazy_class)
+        if 'validate_line' not in namespace:
+            cls.validate_line = _CompiledOnFirstUse(
+                cls, 'validate_line', _compile_validator)
+        if 'parse_correct' not in namespace:
+            cls.parse_correct = _CompiledOnFirstUse(
+                cls, 'parse_correct', _compile_correct_parser)
+
+
+def _tuple_getter(names):
+    """Like operator.attrgetter(*names), but always returns a tuple."""
+    if len(names) == 1:
+        getter = operator.attrgetter(names[0])
+        return lambda ob: (getter(ob),)
+    return operator.attrgetter(*names)
+
+
+def _tuple_setter(names):
+    """Return a function(ob, values) that sets the named attributes of ob
+    from the tuple values, in one tuple assignment."""
+    namespace = {}
+    exec("def set_values(self, values):\n"
+         "    ({0},) = values".format(
+            ", ".join("self." + name for name in names)), namespace)
+    return namespace['set_values']
+
+
+class _LazyLine(object):
+    """Mixin for the classes made by compile_lazy_class(). Instances are
+    made from a line number and the line as a byte string (non-ASCII
+    characters replaced), and don't check the line until its fields
+    are read.
+
+    Reading a field of a line that isn't correct raises a LineError.
+    Fields that are blank are just None, like after parse(); call
+    validate() for all the errors parse() would give.
+
+    Setting a field marks the line as edited (the _edited slot is only
+    set then, to keep loading cheap); to_bytes() returns the raw line
+    unless it was edited."""
+    __slots__ = ()
+
+    def __init__(self, line_number, line):
+        self.line_number = line_number
+        self._raw = line
+        self._checked = False  # Whether the field offsets are right
+
+    def __reduce__(self):
+        if getattr(self, '_edited', False):
+            # Also the fields that were read or set
+            eager_class = self._eager_class
+            values = {}
+            for fieldname, _, _ in eager_class.FIELDS:
+                try:
+                    values[fieldname] = getattr(
+                        eager_class, fieldname).__get__(self)
+                except AttributeError:
+                    pass
+            return (_restore_lazy_line,
+                    (eager_class, self.line_number, self._raw, values))
+        return (_restore_lazy_line,
+                (self._eager_class, self.line_number, self._raw))
+
+    def to_bytes(self):
+        """Return the line as it was read, or if fields were set since,
+        with only those fields formatted anew (if their value changed).
+        Raises a LineError for an edited line whose fields can't be
+        found because it has the wrong number or width of fields."""
+        if not getattr(self, '_edited', False):
+            return self._raw
+        if not self._checked and not self._check_layout():
+            raise LineError(self.validate())
+
+        eager_class = self._eager_class
+        original = type(self)(self.line_number, self._raw)
+        fields = []
+        for (fieldname, length, format), raw_field in zip(
+                eager_class.FIELDS, self._raw.split(b'|')):
+            try:
+                # The slot, so that fields that were never read or set
+                # aren't decoded
+                value = getattr(eager_class, fieldname).__get__(self)
+            except AttributeError:
+                fields.append(raw_field)
+                continue
+            try:
+                unchanged = value == getattr(original, fieldname)
+            except LineError:
+                unchanged = False
+            if unchanged:
+                fields.append(raw_field)
+            else:
+                fields.append(format_field(
+                        value, length, format, fieldname).encode('ascii'))
+        return b'|'.join(fields)
+
+    def _check_layout(self):
+        if self._match(self._raw) is None:
+            return False
+        self._checked = True
+        return True
+
+    def _fallback(self, cached):
+        """Decoding a field failed, parse the whole line to find out
+        why. Returns the field's value if it turns out to be fine."""
+        errors = self.validate()
+        try:
+            return cached(self)
+        except AttributeError:
+            raise LineError(errors)
+
+    def validate(self):
+        """Parse the whole line and return its errors, like parse(). If
+        all fields could be parsed, their values are kept."""
+        eager = self._eager_class()
+        errors = eager.parse(self.line_number, self._raw.decode('ascii'))
+        try:
+            values = eager._get_values(eager)
+        except AttributeError:  # Not all fields could be parsed
+            return errors
+
+        eager_class = self._eager_class
+        for name, value in zip(eager_class._attribute_names, values):
+            getattr(eager_class, name).__set__(self, value)
+        self._checked = True
+        return errors
+
+
+def _restore_lazy_line(line_class, line_number, line, values=None):
+    """Unpickle a lazily parsed line, see _LazyLine.__reduce__."""
+    lazy_line = line_class.lazy_class(line_number, line)
+    if values:
+        for fieldname, value in values.items():
+            setattr(lazy_line, fieldname, value)
+    return lazy_line
+
+
+def _restore_line(line_class, values):
+    """Unpickle a line, see RibLine.__reduce__."""
+    line = line_class.__new__(line_class)
+    if isinstance(values, dict):
+        for name, value in values.items():
+            setattr(line, name, value)
+    else:
+        line._set_values(values)
+    return line
+
+
+def _pack_lines(lines, lines_by_type):
+    """Return the lines of a SUFRIB21 object as (order, blocks) for
+    pickling, or None if they can't be packed (lazily parsed lines,
+    lines that aren't completely parsed).
+
+    Blocks has a (record type, line class, columns) tuple per record
+    type, with the values of each attribute of its lines as a column
+    (see _pack_column()); order is a byte string with the number of the
+    block of each line. Pickling that takes a lot less time than
+    pickling each line (see RibLine.__reduce__), and unpickling too,
+    which matters when the lines are sent back from other processes
+    (see parsers.parse_many()): there, it's done by only one."""
+    blocks = []
+    block_numbers = {}  # Line class -> block number
+    for record_type, record_lines in sorted(lines_by_type.items()):
+        line_class = type(record_lines[0])
+        if line_class in block_numbers or issubclass(line_class, _LazyLine):
+            return None
+        try:
+            values = list(map(line_class._get_values, record_lines))
+        except AttributeError:  # Not completely parsed
+            return None
+        block_numbers[line_class] = len(blocks)
+        blocks.append((record_type, line_class,
+                       [_pack_column(column) for column in zip(*values)]))
+
+    try:
+        order = bytearray(block_numbers[type(line)] for line in lines)
+    except (KeyError, ValueError):
+        return None
+    for block_number, (record_type, _, _) in enumerate(blocks):
+        if (order.count(bytearray((block_number,))) !=
+                len(lines_by_type[record_type])):
+            return None
+    return bytes(order), blocks
+
+
+def _pack_column(column):
+    """Return a column of values as (distinct values, codes), with codes
+    the index into the distinct values of each value, as an array's
+    (typecode, bytes), or as (column, None) if most values are distinct.
+    The values of a column all have the same format, so equal values
+    (like 1 and 1.0) are of the same type."""
+    distinct = tuple(set(column))
+    if 2 * len(distinct) > len(column):
+        return column, None
+    codes = dict(zip(distinct, range(len(distinct))))
+    typecode = ('B' if len(distinct) <= 1 << 8 else
+                'H' if len(distinct) <= 1 << 16 else 'i')
+    return distinct, (typecode, array.array(
+            str(typecode), map(codes.__getitem__, column)).tostring())
+
+
+def _unpack_lines(order, blocks):
+    """Return the lines and lines by record type packed by
+    _pack_lines()."""
+    lines_by_type = {}
+    block_lines = []
+    for record_type, line_class, columns in blocks:
+        record_lines = line_class._build_lines(
+            [values for (values, _) in columns],
+            [range(len(values)) if codes is None
+             else array.array(str(codes[0]), codes[1])
+             for (values, codes) in columns])
+        lines_by_type[record_type] = record_lines
+        block_lines.append(iter(record_lines))
+    lines = [next(block_lines[block_number])
+             for block_number in bytearray(order)]
+    return lines, lines_by_type
+
+
+# Base class that works both with Python 2 and 3 metaclass syntax
+_RibLineBase = RibLineType(str('_RibLineBase'), (object,), {'__slots__': ()})
+
+
+class RibLine(_RibLineBase):
+    """Base class for RIB line classes.
+
+    Line classes store their fields in __slots__ generated from FIELDS,
+    the size of an instance (not counting the field values themselves)
+    is given in each class's docstring, for 64-bit CPython 2.7."""
+    __slots__ = (str('line_number'),)
     FIELDS = ()
-    """Base class for RIB line classes"""
+    # What check() requires of a line, as far as validate_line() needs to
+    # know: fields that must be filled in, and the allowed values of
+    # fields (if filled in).
+    REQUIRED = ()
+    CHOICES = {}
+
+    def __reduce__(self):
+        # Pickle lines as a class and a tuple of values, that's a lot
+        # more compact than a dictionary of all attributes per line.
+        try:
+            values = self._get_values(self)
+        except AttributeError:  # Not (completely) parsed
+            values = dict((name, getattr(self, name))
+                          for name in self._attribute_names
+                          if hasattr(self, name))
+        return (_restore_line, (type(self), values))
+
+    def __unicode__(self):
+        return self.to_bytes().decode('ascii')
+
+    def __str__(self):
+        return self.to_bytes()
+
+    def to_bytes(self):
+        """Return the line as it is written in a file, see
+        compile_formatter(). Raises ValueError (UnicodeEncodeError for
+        non-ASCII text) if a value can't be written."""
+        return self.format_line().encode('ascii')
+
+    def format_line(self):
+        """Compiled from FIELDS for each line class, see
+        compile_formatter()."""
+        return ""
+
     def parse(self, line_number, line):
+        """Parse the line field by field. This is the reference
+        implementation; subclasses use a compiled version of it that
+        falls back to this one to report errors."""
         self.line_number = line_number
 
         fields = self.FIELDS
@@ -26,12 +849,8 @@ class RibLine(object):
 
         if len(line_fields) != len(fields):
             return [
-                Error(line_number=line_number,
-                      message=("Regel heeft {line_fields} velden, "
-                               "verwachtte er {expected_fields}.")
-                      .format(line_fields=len(line_fields),
-                              expected_fields=len(fields)))
-                ]
+                Error(line_number, code='field_count',
+                      details=(len(line_fields), len(fields)))]
 
         field_starts_at = 1  # Fancy sidecar
         for (field_num, (fieldname, expected_length, format)
@@ -40,16 +859,9 @@ class RibLine(object):
             # Check for length
             if len(field) != expected_length:
                 return [
-                    Error(
-                        line_number=line_number,
-                        message=("Het {fieldnr}e veld, {name}, is {l} "
-                                 "tekens lang, moet {e} zijn. "
-                                 "Veld begint in kolom {column}.")
-                        .format(fieldnr=field_num + 1,
-                                name=fieldname,
-                                l=len(field),
-                                e=expected_length,
-                                column=field_starts_at))]
+                    Error(line_number, code='field_length', field=fieldname,
+                          details=(field_num + 1, len(field),
+                                   expected_length, field_starts_at))]
             field_starts_at += expected_length + 1
 
             # Note that we don't check for required fields here, so if
@@ -64,27 +876,10 @@ class RibLine(object):
                 if correct:
                     setattr(self, fieldname, interpreted_field)
                 else:
-                    if field == 'float':
-                        message = (
-                        ("Het {fieldnr}e veld, {name}, moet een decimaal "
-                         "getal bevatten. Decimale getallen moeten met "
-                         "een punt geschreven worden, niet met een komma.")
-                        .format(
-                                fieldnr=field_num + 1,
-                                name=fieldname))
-                    else:
-                        message = (
-                            "Het {fieldnr}e veld, {name}, heeft als "
-                            "inhoud '{content}' en dat is niet van de vorm "
-                            "'{format}'.").format(
-                            fieldnr=field_num + 1,
-                            name=fieldname,
-                            content=field,
-                            format=format)
                     return [
-                        Error(
-                            line_number=line_number,
-                            message=message)]
+                        Error(line_number, code='field_format',
+                              field=fieldname,
+                              details=(field_num + 1, field, format))]
             else:
                 # Otherwise just use the field verbatim
                 setattr(self, fieldname, field)
@@ -96,6 +891,8 @@ class RibLine(object):
 
 
 class AlgeLine(RibLine):
+    """*ALGE line, general information about the file. An instance
+    takes 152 bytes."""
     FIELDS = (
         ('record_type', 5, None),
         ('ABA', 15, None),
@@ -112,6 +909,7 @@ class AlgeLine(RibLine):
 
 
 class RiooLine(RibLine):
+    """*RIOO line, a sewer pipe. An instance takes 448 bytes."""
     FIELDS = (
         ('record_type', 5, None),
         ('AAA', 30, None),
@@ -162,27 +960,28 @@ class RiooLine(RibLine):
         ('ADE', 120, None),
         ('ACR', 6, 'float'),
         ('ACS', 6, 'float'))
+    REQUIRED = ('AAA', 'AAD', 'AAF')
 
     def check(self):
         errors = []
 
         if self.AAA is None:
             errors.append(Error(
-                    line_number=self.line_number,
-                    message=(
-                "Verplicht veld AAA (strengreferentie) is niet ingevuld.")))
+                    self.line_number, code='missing', field='AAA',
+                    details=("Verplicht veld AAA (strengreferentie) is niet "
+                             "ingevuld.",)))
 
         if self.AAD is None:
             errors.append(Error(
-                    line_number=self.line_number,
-                    message=("Verplicht veld AAD (knooppuntreferentie 1) "
-                             "is niet ingevuld.")))
+                    self.line_number, code='missing', field='AAD',
+                    details=("Verplicht veld AAD (knooppuntreferentie 1) "
+                             "is niet ingevuld.",)))
 
         if self.AAF is None:
             errors.append(Error(
-                    line_number=self.line_number,
-                    message=("Verplicht veld AAF (knooppuntreferentie 2) "
-                             "is niet ingevuld.")))
+                    self.line_number, code='missing', field='AAF',
+                    details=("Verplicht veld AAF (knooppuntreferentie 2) "
+                             "is niet ingevuld.",)))
         return errors
 
     @property
@@ -225,6 +1024,7 @@ class RiooLine(RibLine):
 
 
 class PutLine(RibLine):
+    """*PUT line, a manhole. An instance takes 376 bytes."""
     FIELDS = (
         ('record_type', 4, None),
         ('CAA', 30, None),
@@ -266,10 +1066,13 @@ class PutLine(RibLine):
         ('CDD', 1, None),
         ('CDE', 120, None),
         ('CCU', 6, None))
+    REQUIRED = ('CAA', 'CAB')
 
     @property
     def putid(self):
         """Putid is CAA stripped, or None if nothing there"""
+        if self.CAA is None:
+            return None
         return self.CAA.strip() or None
 
     @property
@@ -292,19 +1095,18 @@ class PutLine(RibLine):
     def check(self):
         errors = []
         if self.putid is None:
-            errors.append(
-                Error(
-                    line_number=self.line_number,
-                    message="Geen knooppunt referentie ingevuld."))
+            errors.append(Error(
+                    self.line_number, code='missing', field='CAA',
+                    details=("Geen knooppunt referentie ingevuld.",)))
         if self.CAB is None:
-            errors.append(
-                Error(
-                    line_number=self.line_number,
-                    message="Geen knooppunt coördinaat ingevuld."))
+            errors.append(Error(
+                    self.line_number, code='missing', field='CAB',
+                    details=("Geen knooppunt coördinaat ingevuld.",)))
         return errors
 
 
 class WaarLine(RibLine):
+    """*WAAR line, an observation. An instance takes 240 bytes."""
     FIELDS = (
         ('record_type', 5, None),
         ('ZZA', 6, None),
@@ -332,6 +1134,7 @@ class WaarLine(RibLine):
 
 
 class MputLine(RibLine):
+    """*MPUT line, a measurement in a manhole. An instance takes 216 bytes."""
     FIELDS = (
         ('record_type', 5, None),
         ('ZYA', 8, None),
@@ -356,6 +1159,8 @@ class MputLine(RibLine):
 
 
 class MrioLine(RibLine):
+    """*MRIO line, a measurement in a sewer pipe. An instance takes 216
+    bytes."""
     FIELDS = (
         ('record_type', 5, None),
         ('ZYA', 8, 'float'),
@@ -377,6 +1182,8 @@ class MrioLine(RibLine):
         ('ZYX', 30, None),
         ('ZYY', 30, None),
         ('ZYZ', 30, None))
+    REQUIRED = ('ZYA', 'ZYB', 'ZYE', 'ZYT')
+    CHOICES = {'ZYB': ('1', '2')}
 
     @property
     def sewer_id(self):
@@ -400,31 +1207,48 @@ class MrioLine(RibLine):
 
         if self.sewer_id is None:
             errors.append(Error(
-                    line_number=self.line_number,
-                    message="Veld ZYE (Streng identificatie) ontbreekt."))
+                    self.line_number, code='missing', field='ZYE',
+                    details=("Veld ZYE (Streng identificatie) ontbreekt.",)))
 
         if self.distance is None:
             errors.append(Error(
-                    line_number=self.line_number,
-                    message="Veld ZYA (Afstand) ontbreekt."))
+                    self.line_number, code='missing', field='ZYA',
+                    details=("Veld ZYA (Afstand) ontbreekt.",)))
 
         if self.ZYB is None:
             errors.append(Error(
-                    line_number=self.line_number,
-                    message="Veld ZYB (Richting referentie) ontbreekt."))
+                    self.line_number, code='missing', field='ZYB',
+                    details=("Veld ZYB (Richting referentie) ontbreekt.",)))
         elif self.ZYB not in "12":
             errors.append(Error(
-                    line_number=self.line_number,
-                  message="Veld ZYB (Richting referentie) moet 1 of 2 zijn."))
+                    self.line_number, code='choice', field='ZYB',
+                    details=("Veld ZYB (Richting referentie) moet 1 of 2 "
+                             "zijn.",)))
 
         if self.ZYT is None:
             errors.append(Error(
-                    line_number=self.line_number,
-                    message="Veld ZYT (Meetwaarde) ontbreekt."))
+                    self.line_number, code='missing', field='ZYT',
+                    details=("Veld ZYT (Meetwaarde) ontbreekt.",)))
 
         return errors
 
 
+# Keys for SUFRIB21._index(); they return a sequence, because a sewer is
+# indexed under both its manholes.
+def _putid(line):
+    return (line.putid,)
+
+
+def _sewer_id(line):
+    return (line.sewer_id,)
+
+
+def _manhole_ids(line):
+    if line.manhole1_id == line.manhole2_id:
+        return (line.manhole1_id,)
+    return (line.manhole1_id, line.manhole2_id)
+
+
 class SUFRIB21(object):
     LINE_CLASSES = {
         '*ALGE': AlgeLine,
@@ -435,29 +1259,206 @@ class SUFRIB21(object):
         '*MRIO': MrioLine
         }
 
-    def __init__(self):
+    def __init__(self, lazy=False):
+        """If lazy is True, lines are added with add_raw_line() and are
+        only parsed as far as their fields are used, see _LazyLine."""
+        self.lazy = lazy
         self.lines = []
+        self._lines_by_type = {}  # Record type -> list of lines
+        self._indexes = {}  # Built on demand by _index()
 
-    def add_line(self, line_number, line, errorlist):
-        record_type = line.split('|')[0].strip()
+    @staticmethod
+    def parse_line(line_number, line):
+        """Parse a single line into an object of the right line class.
+        Returns a (line object, []) tuple, or (None, errors) if the line
+        isn't correct."""
+        record_type = line.partition('|')[0].strip()
 
         if record_type not in SUFRIB21.LINE_CLASSES:
-            errorlist.append(Error(
-                    line_number=line_number,
-                    message="Onbekend recordtype: '{record_type}'."
-                    .format(record_type=record_type)))
+            return None, [Error(line_number, code='record_type',
+                                details=(record_type,))]
+
+        line_class = SUFRIB21.LINE_CLASSES[record_type]
+        line_instance = line_class.parse_correct(line_number, line)
+        if line_instance is not None:
+            return line_instance, []
+        line_instance = line_class()
+        line_errors = line_instance.parse(line_number, line)
+        if line_errors:
+            return None, line_errors
+        return line_instance, []
+
+    def add_line(self, line_number, line, errorlist):
+        # Shortcut for correct lines, whose record type field is exactly
+        # the record type (see RibLine.parse_correct())
+        record_type = _LINE_STARTS.get(line[:LINE_START])
+        line_class = SUFRIB21.LINE_CLASSES.get(record_type)
+        if line_class is not None:
+            line_instance = line_class.parse_correct(line_number, line)
+            if line_instance is not None:
+                # Like _append()
+                self.lines.append(line_instance)
+                try:
+                    self._lines_by_type[record_type].append(line_instance)
+                except KeyError:
+                    self._lines_by_type[record_type] = [line_instance]
+                if self._indexes:
+                    self._indexes.clear()
+                return
+
+        line_instance, line_errors = self.parse_line(line_number, line)
+        if line_errors:
+            errorlist += line_errors
         else:
-            line_class = SUFRIB21.LINE_CLASSES[record_type]
-            line_instance = line_class()
-            line_errors = line_instance.parse(line_number, line)
-            if line_errors:
-                errorlist += line_errors
+            self._append(line_instance, line_instance.record_type)
+
+    def add_lines(self, line_number, lines, errorlist, add_line=None):
+        """Add lines like add_line(), the first with number line_number.
+        Returns the number the next line would get. Faster than calling
+        add_line() for each line, for correct lines. The other lines are
+        passed to add_line (default self.add_line), for instance to time
+        them, see stats.ParseStats."""
+        if add_line is None:
+            add_line = self.add_line
+        line_starts = _LINE_STARTS
+        line_classes = SUFRIB21.LINE_CLASSES
+        append = self.lines.append
+        lines_by_type = self._lines_by_type
+        for line in lines:
+            record_type = line_starts.get(line[:LINE_START])
+            line_class = line_classes.get(record_type)
+            line_instance = None
+            if line_class is not None:
+                line_instance = line_class.parse_correct(line_number, line)
+            if line_instance is None:
+                add_line(line_number, line, errorlist)
             else:
-                self.lines.append(line_instance)
+                append(line_instance)
+                try:
+                    lines_by_type[record_type].append(line_instance)
+                except KeyError:
+                    lines_by_type[record_type] = [line_instance]
+            line_number += 1
+        if self._indexes:
+            self._indexes.clear()
+        return line_number
+
+    def add_raw_line(self, line_number, line, errorlist):
+        """Add a line, a byte string with only ASCII characters, as a
+        lazily parsed line. Only an unknown record type is an error
+        here; validate() finds the others."""
+        record_type = _RAW_RECORD_TYPES.get(line.partition(b'|')[0].strip())
+        line_class = SUFRIB21.LINE_CLASSES.get(record_type)
+        if line_class is None:
+            errorlist += self.parse_line(line_number, line.decode('ascii'))[1]
+        else:
+            self._append(line_class.lazy_class(line_number, line), record_type)
+
+    def _append(self, line_instance, record_type):
+        self.lines.append(line_instance)
+        self._lines_by_type.setdefault(record_type, []).append(line_instance)
+        if self._indexes:
+            self._indexes.clear()
+
+    def __getstate__(self):
+        # Pickle the lines of each record type as columns of values, see
+        # _pack_lines(). The indexes are built again when they're used.
+        state = self.__dict__.copy()
+        state['_indexes'] = {}
+        if '_packed_lines' not in state:
+            packed = _pack_lines(self.lines, self._lines_by_type)
+            if packed is not None:
+                del state['lines'], state['_lines_by_type']
+                state['_packed_lines'] = packed
+        return state
+
+    def __getattr__(self, name):
+        # Only called for attributes that aren't there: after unpickling,
+        # the lines are only made when they're first used.
+        if (name in ('lines', '_lines_by_type') and
+                '_packed_lines' in self.__dict__):
+            self.lines, self._lines_by_type = _unpack_lines(
+                *self.__dict__.pop('_packed_lines'))
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def validate(self):
+        """Return the errors of the lazily parsed lines, in order. These
+        are the errors that parsing the file normally would have given,
+        except for unknown record types, which add_raw_line() already
+        reported."""
+        errors = []
+        for line in self.lines:
+            if isinstance(line, _LazyLine):
+                errors += line.validate()
+        return errors
+
+    def extend(self, other):
+        """Add the lines of other, a SUFRIB21 object parsed from the lines
+        that follow ours (see parsers.parse_collecting_errors)."""
+        self.lines += other.lines
+        for record_type, lines in other._lines_by_type.items():
+            self._lines_by_type.setdefault(record_type, []).extend(lines)
+        self._indexes.clear()
 
     def lines_of_type(self, record_type):
-        return [line for line in self.lines
-                if line.record_type == record_type]
+        return list(self._lines_by_type.get(record_type, ()))
+
+    def _index(self, record_type, key, unique):
+        """Return a dictionary of the lines of this record type, keyed
+        on key(line). If unique, the first line with a given key is the
+        value, otherwise a list of all of them. Lines with a None key
+        aren't indexed. Indexes are only built when they are first
+        needed, and rebuilt after lines are added."""
+        index_key = (record_type, key, unique)
+        index = self._indexes.get(index_key)
+        if index is None:
+            index = self._indexes[index_key] = {}
+            for line in self._lines_by_type.get(record_type, ()):
+                for value in key(line):
+                    if value is None:
+                        continue
+                    if unique:
+                        index.setdefault(value, line)
+                    else:
+                        index.setdefault(value, []).append(line)
+        return index
+
+    def manhole(self, putid):
+        """Return the (first) *PUT line with this putid, or None."""
+        return self._index('*PUT', _putid, True).get(putid)
+
+    def sewer(self, sewer_id):
+        """Return the (first) *RIOO line with this sewer_id, or None."""
+        return self._index('*RIOO', _sewer_id, True).get(sewer_id)
+
+    def sewers_of_manhole(self, manhole_id):
+        """Return the *RIOO lines that have this manhole as manhole1 or
+        manhole2."""
+        return list(self._index('*RIOO', _manhole_ids, False).get(
+                manhole_id, ()))
+
+    def measurements_of_sewer(self, sewer_id):
+        """Return the *MRIO lines with this sewer_id."""
+        return list(self._index('*MRIO', _sewer_id, False).get(
+                sewer_id, ()))
+
+
+# For add_line(): the first LINE_START characters of a correct line ->
+# its record type. Record types are at least four characters, so those
+# are the record type and possibly the '|' after it. The line class is
+# looked up in SUFRIB21.LINE_CLASSES for each line, like parse_line()
+# does, so that classes replaced there are used. Record types added there
+# only take the slow path.
+LINE_START = 5
+_LINE_STARTS = dict(
+    ((record_type + '|')[:LINE_START], record_type)
+    for record_type in SUFRIB21.LINE_CLASSES)
+
+# For add_raw_line(): record type as a byte string -> record type
+_RAW_RECORD_TYPES = dict(
+    (record_type.encode('ascii'), record_type)
+    for record_type in SUFRIB21.LINE_CLASSES)
 
 
 class RIB21(SUFRIB21):
@@ -468,12 +1469,71 @@ class RIB21(SUFRIB21):
         '*WAAR': WaarLine,
         }
 
-    def __unicode__(self):
-        s = "RIB21 bestand. Regels:\n"
+    def cache_wgs84_points(self):
+        """Transform the RD points of all manholes and sewers to WGS84 in
+        one call, after which their WGS84 properties are cache lookups
+        (see util.rd_to_wgs84_many). The cache keeps the last
+        util.WGS84_CACHE_SIZE points, so for bigger files only part of
+        them stays cached."""
+        points = []
         for line in self.lines:
-            s += unicode(line) + "\n"
+            if isinstance(line, PutLine):
+                points.append(line.CAB)
+            elif isinstance(line, RiooLine):
+                points.append(line.AAE)
+                points.append(line.AAG)
+
+        util.rd_to_wgs84_many(point for point in points if point is not None)
+
+    def manhole_index(self, cell_size=None):
+        """Return a spatial.SpatialIndex of the manholes (*PUT lines) by
+        their RD point. Built on first use, like the other indexes."""
+        return self._spatial_index('manholes', cell_size)
+
+    def sewer_index(self, cell_size=None):
+        """Return a spatial.SpatialIndex of the sewers (*RIOO lines), as
+        segments between the RD points of their manholes. Built on first
+        use, like the other indexes."""
+        return self._spatial_index('sewers', cell_size)
+
+    def network(self):
+        """Return the network.Network of the manholes and sewers. Built
+        on first use, like the other indexes."""
+        from . import network
+        index = self._indexes.get('network')
+        if index is None:
+            index = self._indexes['network'] = network.Network(self)
+        return index
+
+    def table(self, record_type):
+        """Return a columnar.RecordTable of the lines of this record type
+        (like '*RIOO'), with dictionary encoded text fields. Built on
+        first use, like the other indexes. Needs numpy.
+
+        Raises errors.LineError if lines were parsed lazily and one of
+        them isn't correct."""
+        from .columnar import RecordTable
+        index_key = ('table', record_type)
+        index = self._indexes.get(index_key)
+        if index is None:
+            index = self._indexes[index_key] = RecordTable(
+                self.LINE_CLASSES[record_type],
+                self._lines_by_type.get(record_type, ()))
+        return index
+
+    def _spatial_index(self, kind, cell_size):
+        from . import spatial
+        index_key = ('spatial', kind, cell_size)
+        index = self._indexes.get(index_key)
+        if index is None:
+            build = (spatial.manhole_index if kind == 'manholes'
+                     else spatial.sewer_index)
+            index = self._indexes[index_key] = build(self, cell_size)
+        return index
 
-        return s
+    def __unicode__(self):
+        return "RIB21 bestand. Regels:\n" + "".join(
+            unicode(line) + "\n" for line in self.lines)
 
 
 class RMB21(SUFRIB21):
@@ -483,6 +1543,53 @@ class RMB21(SUFRIB21):
         '*MRIO': MrioLine
         }
 
+    def __init__(self, columnar=False, lazy=False):
+        """If columnar is True, *MRIO lines are not kept in self.lines
+        but in self.columns, a columnar.MrioColumns object (this needs
+        numpy). Those lines are never lazy."""
+        super(RMB21, self).__init__(lazy)
+        if columnar:
+            from .columnar import MrioColumns
+            self.columns = MrioColumns()
+        else:
+            self.columns = None
+
+    def extend(self, other):
+        super(RMB21, self).extend(other)
+        if self.columns is not None:
+            self.columns.extend(other.columns)
+
+    def add_line(self, line_number, line, errorlist):
+        if (self.columns is not None and
+                line.partition('|')[0].strip() == '*MRIO'):
+            self.columns.add_line(line_number, line, errorlist)
+        else:
+            SUFRIB21.add_line(self, line_number, line, errorlist)
+
+    def add_lines(self, line_number, lines, errorlist, add_line=None):
+        if self.columns is not None:
+            for line in lines:
+                self.add_line(line_number, line, errorlist)
+                line_number += 1
+            return line_number
+        return SUFRIB21.add_lines(
+            self, line_number, lines, errorlist, add_line)
+
+    def profiles(self, rib=None):
+        """Return a profiles.Profiles of the *MRIO measurements, joined
+        to the sewers of rib (a RIB21), or to the *RIOO lines in this
+        file if rib is None. Needs numpy."""
+        from .profiles import Profiles
+        return Profiles(self, rib)
+
+    def add_raw_line(self, line_number, line, errorlist):
+        if (self.columns is not None and
+                line.partition(b'|')[0].strip() == b'*MRIO'):
+            self.columns.add_line(
+                line_number, line.decode('ascii'), errorlist)
+        else:
+            super(RMB21, self).add_raw_line(line_number, line, errorlist)
+
 
 def check_format(format, field):
     success = False
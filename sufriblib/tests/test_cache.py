@@ -0,0 +1,162 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of the on-disk cache of parse results."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from sufriblib import cache
+from sufriblib import parsers
+from sufriblib import stats
+from sufriblib import sufrib
+from sufriblib.tests import utils
+
+
+class TestParseCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The smallest correct file and the smallest with errors
+        cls.paths = {}
+        for path in sorted(utils.data_files(), key=os.path.getsize):
+            cls.paths.setdefault(bool(parsers.parse(path)[1]), path)
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.cache = cache.ParseCache(os.path.join(self.tempdir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def copy(self, with_errors=False):
+        path = self.paths[with_errors]
+        new_path = os.path.join(self.tempdir, os.path.basename(path))
+        shutil.copy(path, new_path)
+        return new_path
+
+    def parse(self, path, parse_cache=None):
+        """Returns ((values, errors), whether it came from the cache)."""
+        parse_stats = stats.ParseStats()
+        sufribobject, errors = parsers.parse(
+            path, cache=parse_cache or self.cache, stats=parse_stats)
+        values = None if sufribobject is None else utils.values(sufribobject)
+        return (values, errors), parse_stats.cached
+
+    def entries(self):
+        return [filename for filename in os.listdir(self.cache.directory)
+                if filename.endswith('.cache')]
+
+    def test_hit(self):
+        for with_errors in (False, True):
+            path = self.copy(with_errors)
+            result, cached = self.parse(path)
+            self.assertFalse(cached)
+            self.assertEqual(self.parse(path), (result, True))
+            self.assertEqual(result[1] != [], with_errors)
+
+    def test_size_change(self):
+        path = self.copy()
+        self.parse(path)
+        with io.open(path, 'ab') as sufribfile:
+            sufribfile.write(b'*BLA|\r\n')
+        self.assertEqual(self.parse(path)[1], False)
+        self.assertEqual(self.parse(path)[1], True)
+
+    def test_mtime_change(self):
+        path = self.copy()
+        self.parse(path)
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime - 10))
+        self.assertEqual(self.parse(path)[1], False)
+
+    def test_content_change(self):
+        path = self.copy()
+        with io.open(path, 'rb') as sufribfile:
+            data = sufribfile.read()
+        # A whole number of seconds, that os.utime() can set again exactly
+        os.utime(path, (1500000000, 1500000000))
+        content_cache = cache.ParseCache(
+            os.path.join(self.tempdir, 'content'), check_content=True)
+        self.parse(path)
+        self.parse(path, content_cache)
+
+        # Same size and modification time, one digit changed
+        changed = bytearray(data)
+        i = min(changed.index(digit) for digit in b'123456789'
+                if digit in changed)
+        changed[i:i + 1] = b'0'
+        with io.open(path, 'wb') as sufribfile:
+            sufribfile.write(bytes(changed))
+        os.utime(path, (1500000000, 1500000000))
+
+        self.assertEqual(self.parse(path)[1], True)
+        self.assertEqual(self.parse(path, content_cache)[1], False)
+
+    def test_other_line_classes(self):
+        path = self.copy()
+        self.parse(path)
+        line_class = sufrib.SUFRIB21.LINE_CLASSES['*ALGE']
+
+        class Line(line_class):
+            __slots__ = ()
+
+        sufrib.SUFRIB21.LINE_CLASSES['*ALGE'] = Line
+        try:
+            self.assertIs(self.cache.get(path), None)
+        finally:
+            sufrib.SUFRIB21.LINE_CLASSES['*ALGE'] = line_class
+
+    def test_evict(self):
+        paths = []
+        for i in range(4):
+            path = self.copy()
+            paths.append(path + str(i))
+            os.rename(path, paths[-1])
+            self.parse(paths[-1])
+        entries = dict((filename, os.path.getsize(
+                    os.path.join(self.cache.directory, filename)))
+                       for filename in self.entries())
+        self.assertEqual(len(entries), 4)
+
+        # Make the first entry the least recently used, then the third
+        now = os.stat(paths[0]).st_mtime
+        for i, path in enumerate(paths):
+            entry_path = self.cache._entry_path(path, False, False)
+            age = {0: 400, 2: 300}.get(i, 100 - i)
+            os.utime(entry_path, (now - age, now - age))
+        self.cache.max_size = sum(entries.values()) - 1
+        self.cache._evict()
+        self.assertEqual(
+            sorted(self.entries()),
+            sorted(os.path.basename(self.cache._entry_path(path, False, False))
+                   for path in (paths[1], paths[2], paths[3])))
+
+        self.cache.max_size = sum(sorted(entries.values())[:2])
+        self.cache._evict()
+        remaining = self.entries()
+        self.assertEqual(
+            sorted(remaining),
+            sorted(os.path.basename(self.cache._entry_path(path, False, False))
+                   for path in (paths[1], paths[3])))
+        self.assertTrue(sum(entries[filename] for filename in remaining) <=
+                        self.cache.max_size)
+
+    def test_corrupt_entry(self):
+        path = self.copy()
+        result, _ = self.parse(path)
+        [filename] = self.entries()
+        with io.open(os.path.join(self.cache.directory, filename),
+                     'wb') as entry:
+            entry.write(b'Geen pickle')
+        self.assertEqual(self.parse(path), (result, False))
+        self.assertEqual(self.parse(path), (result, True))
@@ -0,0 +1,167 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of the NumPy storage of sufriblib.columnar."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import unittest
+
+import numpy as np
+
+from sufriblib import columnar
+from sufriblib import parsers
+from sufriblib import sufrib
+from sufriblib.tests import utils
+
+
+def make_sewers():
+    """*RIOO lines with blank, padded and repeated text fields, and blank
+    number and coordinate fields."""
+    return [
+        utils.make_line(sufrib.RiooLine, 1, AAA='s1  ', AAD='A',
+                        AAE=(1.0, 2.0), ACB=0.5),
+        utils.make_line(sufrib.RiooLine, 2, AAA='s2', AAD=None,
+                        AAE=None, ACB=None),
+        utils.make_line(sufrib.RiooLine, 3, AAA='  s1', AAD='A',
+                        AAE=(3.0, 4.0), ACB=1.5),
+        utils.make_line(sufrib.RiooLine, 4, AAA='s3', AAD=None,
+                        AAE=(5.0, 6.0), ACB=None),
+        ]
+
+
+class TestRecordTable(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = make_sewers()
+        self.table = columnar.RecordTable(sufrib.RiooLine, self.lines)
+
+    def test_codes(self):
+        self.assertEqual(self.table.categories('AAD'), ['A'])
+        self.assertEqual(self.table.codes('AAD').tolist(), [0, -1, 0, -1])
+        # As in the file, so with their spaces
+        self.assertEqual(self.table.categories('AAA'),
+                         ['s1  ', 's2', '  s1', 's3'])
+        self.assertEqual(self.table.codes('AAA').dtype, np.int8)
+        self.assertRaises(KeyError, self.table.codes, 'ACB')
+
+    def test_values(self):
+        self.assertEqual(self.table.values('AAD').tolist(),
+                         ['A', None, 'A', None])
+        acb = self.table.values('ACB')
+        self.assertEqual(acb[[0, 2]].tolist(), [0.5, 1.5])
+        self.assertTrue(np.isnan(acb[[1, 3]]).all())
+        aae = self.table.values('AAE')
+        self.assertEqual(aae.shape, (4, 2))
+        self.assertTrue(np.isnan(aae[1]).all())
+        self.assertEqual(aae[3].tolist(), [5.0, 6.0])
+
+    def test_line(self):
+        for i, line in enumerate(self.lines):
+            copy = self.table.line(i)
+            self.assertIs(type(copy), sufrib.RiooLine)
+            self.assertEqual(copy._get_values(copy), line._get_values(line))
+        self.assertIs(self.table.line(1).ACB, None)
+        self.assertIs(self.table.line(1).AAE, None)
+
+    def test_mask(self):
+        self.assertEqual(self.table.mask('AAA', 's1').tolist(),
+                         [True, False, True, False])
+        self.assertEqual(self.table.mask('AAA', ' s1 ', 's3').tolist(),
+                         [True, False, True, True])
+        self.assertEqual(self.table.mask('AAD', None).tolist(),
+                         [False, True, False, True])
+
+    def test_counts(self):
+        self.assertEqual(self.table.counts('AAA'),
+                         {'s1': 2, 's2': 1, 's3': 1})
+        self.assertEqual(self.table.counts('AAD'), {'A': 2, None: 2})
+        self.assertEqual(
+            self.table.counts('AAD', self.table.mask('AAA', 's1')), {'A': 2})
+
+    def test_data_files(self):
+        for path in utils.data_files():
+            rib, _ = parsers.parse(path)
+            if not isinstance(rib, sufrib.RIB21):
+                continue
+            for record_type in ('*PUT', '*RIOO'):
+                lines = rib.lines_of_type(record_type)
+                table = rib.table(record_type)
+                self.assertEqual(len(table), len(lines))
+                self.assertEqual(
+                    [table.line(i)._get_values(table.line(i))
+                     for i in range(len(table))],
+                    [line._get_values(line) for line in lines])
+
+
+def mrio_lines():
+    """The *MRIO lines of the first correct RMB data file, from a normal
+    parse."""
+    for path in utils.data_files():
+        rmb, _ = parsers.parse(path)
+        if isinstance(rmb, sufrib.RMB21) and rmb.lines_of_type('*MRIO'):
+            return rmb.lines_of_type('*MRIO')
+
+
+class TestMrioColumns(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.lines = mrio_lines()
+
+    def check_sewers(self, columns, lines):
+        per_sewer = {}
+        for line in lines:
+            per_sewer.setdefault(line.sewer_id, []).append(line)
+        self.assertEqual(sorted(columns.sewer_ids), sorted(per_sewer))
+        for sewer_id, sewer_lines in per_sewer.items():
+            measurements = columns.sewer(sewer_id)
+            self.assertEqual(measurements.line_number.tolist(),
+                             [line.line_number for line in sewer_lines])
+            self.assertEqual(measurements.distance.tolist(),
+                             [line.distance for line in sewer_lines])
+            self.assertEqual(measurements.measurement.tolist(),
+                             [line.measurement for line in sewer_lines])
+            self.assertEqual(measurements.direction.tolist(),
+                             [int(line.ZYB) for line in sewer_lines])
+            for view, column in zip(measurements, (
+                    columns.line_number, columns.distance,
+                    columns.measurement, columns.direction)):
+                self.assertTrue(view.base is column)
+
+    def test_contiguous(self):
+        columns = columnar.MrioColumns.from_lines(self.lines)
+        self.check_sewers(columns, self.lines)
+        # Already grouped per sewer, so in file order
+        self.assertEqual(columns.line_number.tolist(),
+                         [line.line_number for line in self.lines])
+
+    def test_not_contiguous(self):
+        # Every sewer's measurements in two parts
+        lines = self.lines[::2] + self.lines[1::2]
+        columns = columnar.MrioColumns.from_lines(lines)
+        self.assertNotEqual(columns.line_number.tolist(),
+                            [line.line_number for line in lines])
+        self.assertTrue(np.all(np.diff(columns.sewer_code) >= 0))
+        self.check_sewers(columns, lines)
+
+    def test_columnar_parse(self):
+        for path in utils.data_files():
+            if not path.lower().endswith('.rmb'):
+                continue
+            errors = []
+            rmb = parsers.parse_collecting_errors(errors, path)
+            columnar_errors = []
+            columnar_rmb = parsers.parse_collecting_errors(
+                columnar_errors, path, columnar=True)
+            self.assertEqual(columnar_errors, errors, path)
+            if rmb is None:
+                continue
+            self.assertEqual(len(columnar_rmb.columns),
+                             len(rmb.lines_of_type('*MRIO')))
+            self.check_sewers(
+                columnar_rmb.columns, rmb.lines_of_type('*MRIO'))
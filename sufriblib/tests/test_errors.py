@@ -0,0 +1,84 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of sufriblib.errors."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import pickle
+import unittest
+
+from sufriblib.errors import Error
+
+
+class TestError(unittest.TestCase):
+
+    def setUp(self):
+        self.error = Error(3, code='field_count', details=(4, 5))
+        self.message = "Regel heeft 4 velden, verwachtte er 5."
+
+    def test_message(self):
+        self.assertEqual(self.error.message, self.message)
+        self.assertEqual(Error(None, "Vrij").message, "Vrij")
+
+    def test_line_number_and_message_pair(self):
+        line_number, message = self.error
+        self.assertEqual((line_number, message), (3, self.message))
+        self.assertEqual(self.error[1], self.message)
+        self.assertEqual(len(self.error), 2)
+        self.assertEqual(self.error, (3, self.message))
+        self.assertEqual(hash(self.error), hash((3, self.message)))
+        self.assertTrue(self.message in self.error)
+        self.assertEqual(self.error + (None,), (3, self.message, None))
+        self.assertEqual(self.error._asdict(),
+                         {'line_number': 3, 'message': self.message})
+
+    def test_star_unpacking(self):
+        self.assertEqual("{0}: {1}".format(*self.error),
+                         "3: " + self.message)
+
+    def test_slicing(self):
+        self.assertEqual(self.error[:2], (3, self.message))
+        self.assertEqual(self.error[-1:], (self.message,))
+
+    def test_percent_formatting(self):
+        self.assertEqual("%s: %s" % self.error, "3: " + self.message)
+
+    def test_sorting_by_message(self):
+        errors = [Error(1, "b"), Error(1, "a"),
+                  Error(0, code='record_type', details=('z',))]
+        self.assertEqual([error.message for error in sorted(errors)],
+                         ["Onbekend recordtype: 'z'.", "a", "b"])
+
+    def test_replace(self):
+        error = self.error._replace(line_number=4)
+        self.assertEqual(error, (4, self.message))
+        self.assertEqual(error.code, 'field_count')
+        error = self.error._replace(message="Anders")
+        self.assertEqual(error, (3, "Anders"))
+        self.assertIs(error.code, None)
+        self.assertRaises(ValueError, self.error._replace, code='x')
+
+    def test_equality(self):
+        self.assertEqual(
+            self.error, Error(3, code='field_count', details=(4, 5)))
+        self.assertNotEqual(
+            self.error, Error(3, code='field_count', details=(4, 6)))
+        # Like tuples, only the line number and message count
+        self.assertEqual(self.error, Error(3, self.message))
+
+    def test_shared_messages(self):
+        other = Error(4, code='field_count', details=(4, 5))
+        self.assertIs(other.message, self.error.message)
+
+    def test_pickle(self):
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            error = pickle.loads(pickle.dumps(self.error, protocol))
+            self.assertIs(type(error), Error)
+            self.assertEqual(error, self.error)
+            self.assertEqual(error.code, 'field_count')
+            self.assertEqual(error.details, (4, 5))
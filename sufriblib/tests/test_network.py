@@ -0,0 +1,104 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of the sewer network on a small hand-built RIB."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import unittest
+
+from sufriblib import sufrib
+from sufriblib.tests import utils
+
+
+def make_rib():
+    """Manholes A to D connected in a chain; sewer s2 is drawn from C to
+    B but its invert levels make it flow from B to C. Manhole A has a
+    duplicate, E and G have no sewers, F is connected to a manhole X
+    without *PUT line, and Y and Z only appear in a sewer."""
+    rib = sufrib.RIB21()
+    for line_number, putid in enumerate('ABCDAEFG', 1):
+        rib._append(utils.make_line(
+                sufrib.PutLine, line_number, CAA=putid), '*PUT')
+    for line_number, (sewer_id, manhole1, manhole2, acr, acs) in enumerate([
+            ('s1', 'A', 'B', 2.0, 1.0),
+            ('s2', 'C', 'B', 0.5, 0.8),
+            ('s3', 'C', 'D', None, None),
+            ('s4', 'D', None, None, None),
+            ('s5', 'D', 'D', None, None),
+            ('s6', 'F', 'X', None, None),
+            ('s7', 'Y', 'Z', None, None),
+            ], 9):
+        rib._append(utils.make_line(
+                sufrib.RiooLine, line_number, AAA=sewer_id, AAD=manhole1,
+                AAF=manhole2, ACR=acr, ACS=acs), '*RIOO')
+    return rib
+
+
+class TestNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.network = make_rib().network()
+
+    def check(self, components=False):
+        return [(error.line_number, error.code, error.details)
+                for error in self.network.check(components)]
+
+    def test_check(self):
+        self.assertEqual(self.check(), [
+                (5, 'duplicate_manhole', ('A', 1)),
+                (6, 'unconnected_manhole', ('E',)),
+                (8, 'unconnected_manhole', ('G',)),
+                (12, 'incomplete_sewer', ('s4',)),
+                (13, 'loop_sewer', ('s5', 'D')),
+                (14, 'unknown_manhole', ('s6', 'X')),
+                (15, 'unknown_manhole', ('s7', 'Y')),
+                (15, 'unknown_manhole', ('s7', 'Z')),
+                ])
+
+    def test_check_components(self):
+        self.assertEqual(
+            [error for error in self.check(components=True)
+             if error[1] == 'component'], [
+                (6, 'component', ('E', 1)),
+                (7, 'component', ('F', 2)),
+                (8, 'component', ('G', 1)),
+                # Y has no *PUT line, so the line of its sewer
+                (15, 'component', ('Y', 2)),
+                ])
+
+    def test_components(self):
+        self.assertEqual(self.network.components(), [
+                ['A', 'B', 'C', 'D'], ['F', 'X'], ['Y', 'Z'], ['E'], ['G']])
+
+    def test_contains(self):
+        for manhole_id in 'ABCDEFGXYZ':
+            self.assertTrue(manhole_id in self.network)
+        self.assertFalse('Q' in self.network)
+
+    def test_neighbours(self):
+        self.assertEqual(
+            [(sewer.sewer_id, manhole_id)
+             for (sewer, manhole_id) in self.network.neighbours('B')],
+            [('s1', 'A'), ('s2', 'C')])
+        self.assertEqual(self.network.neighbours('Q'), [])
+
+    def test_downstream(self):
+        self.assertEqual(self.network.downstream('A'), ['B', 'C', 'D'])
+        # s2 flows from B to C although it is drawn the other way
+        self.assertEqual(self.network.downstream('B'), ['C', 'D'])
+        self.assertEqual(self.network.downstream('D'), [])
+
+    def test_upstream(self):
+        self.assertEqual(self.network.upstream('D'), ['C', 'B', 'A'])
+        self.assertEqual(self.network.upstream('B'), ['A'])
+        self.assertEqual(self.network.upstream('A'), [])
+
+    def test_incomplete_sewers_are_left_out(self):
+        self.assertEqual(
+            [sewer.sewer_id for sewer in self.network.sewers],
+            ['s1', 's2', 's3', 's5', 's6', 's7'])
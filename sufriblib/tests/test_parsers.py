@@ -0,0 +1,242 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests that the different ways of parsing a file give the same result
+as parsing it in one go."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import contextlib
+import gzip
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from sufriblib import parsers
+from sufriblib import writers
+from sufriblib.tests import utils
+
+
+def parse(path, **kwargs):
+    errors = []
+    sufribobject = parsers.parse_collecting_errors(errors, path, **kwargs)
+    return utils.values(sufribobject), errors
+
+
+class TestParsers(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.expected = dict(
+            (path, parse(path)) for path in utils.data_files())
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def copy(self, path, data=None):
+        """Copy the file at path to the temporary directory, or write data
+        to a file with the same name there. Returns the new path."""
+        new_path = os.path.join(self.tempdir, os.path.basename(path))
+        if data is None:
+            shutil.copy(path, new_path)
+        else:
+            with io.open(new_path, 'wb') as sufribfile:
+                sufribfile.write(data)
+        return new_path
+
+    def test_there_are_files_with_errors(self):
+        self.assertTrue(any(
+                errors for (_, errors) in self.expected.values()))
+
+    def test_chunks(self):
+        min_chunk_size = parsers.MIN_CHUNK_SIZE
+        parsers.MIN_CHUNK_SIZE = 16 * 1024
+        try:
+            chunked = [path for path in self.expected
+                       if len(parsers._chunks(path, 3)) > 1]
+            self.assertTrue(chunked)
+            for path in chunked:
+                self.assertEqual(
+                    parse(path, workers=3), self.expected[path], path)
+        finally:
+            parsers.MIN_CHUNK_SIZE = min_chunk_size
+
+    def test_feed_parser(self):
+        for path, expected in self.expected.items():
+            with io.open(path, 'rb') as sufribfile:
+                data = sufribfile.read()
+            for chunk_size in (7, 4096):
+                parser = parsers.FeedParser(path)
+                for start in range(0, len(data), chunk_size):
+                    parser.feed(data[start:start + chunk_size])
+                self.assertEqual(
+                    (utils.values(parser.close()), parser.errors), expected,
+                    path)
+
+    def test_tail_parser(self):
+        for path, expected in self.expected.items():
+            with io.open(path, 'rb') as sufribfile:
+                data = sufribfile.read()
+            new_path = self.copy(path, b'')
+            parser = parsers.TailParser(new_path)
+            with io.open(new_path, 'ab') as sufribfile:
+                for start in range(0, len(data), 50000):
+                    sufribfile.write(data[start:start + 50000])
+                    sufribfile.flush()
+                    parser.update()
+            parser.update(final=True)
+            self.assertEqual(
+                (utils.values(parser.sufribobject), parser.errors), expected,
+                path)
+
+    def test_cr_line_endings(self):
+        for path, expected in self.expected.items():
+            with io.open(path, 'rb') as sufribfile:
+                data = sufribfile.read()
+            new_path = self.copy(
+                path, b'\r'.join(data.splitlines()) + b'\r')
+            self.assertEqual(parse(new_path), expected, path)
+
+            block_size = parsers.BLOCK_SIZE
+            parsers.BLOCK_SIZE = 4096
+            try:
+                self.assertEqual(parse(new_path), expected, path)
+            finally:
+                parsers.BLOCK_SIZE = block_size
+
+    def test_pickle(self):
+        for path, expected in self.expected.items():
+            sufribobject = parsers.parse_collecting_errors([], path)
+            copy = pickle.loads(pickle.dumps(sufribobject, 2))
+            # The lines are only made when they're used
+            self.assertTrue('_packed_lines' in copy.__dict__)
+            again = pickle.loads(pickle.dumps(copy, 2))
+            for unpickled in (copy, again):
+                self.assertEqual(utils.values(unpickled), expected[0], path)
+                for record_type in sufribobject._lines_by_type:
+                    self.assertEqual(
+                        list(map(id, unpickled.lines_of_type(record_type))),
+                        [id(line) for line in unpickled.lines
+                         if line.record_type == record_type])
+
+    def test_write(self):
+        for path, (expected_values, errors) in self.expected.items():
+            if errors:
+                continue
+            sufribobject, errors = parsers.parse(path)
+            new_path = self.copy(path, b'')
+            writers.write(sufribobject, new_path)
+            self.assertEqual(parse(new_path), (expected_values, []), path)
+
+    def test_write_lazy(self):
+        for path, (expected_values, errors) in self.expected.items():
+            with io.open(path, 'rb') as sufribfile:
+                lines = sufribfile.read().translate(
+                    parsers._ASCII).splitlines()
+            sufribobject, errors = parsers.parse(path, lazy=True)
+            if errors:
+                continue
+            new_path = self.copy(path, b'')
+            writers.write(sufribobject, new_path)
+            with io.open(new_path, 'rb') as sufribfile:
+                self.assertEqual(sufribfile.read().splitlines(), lines)
+
+
+class TestArchives(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The smallest correct RIB and RMB files
+        cls.paths = {}
+        for path in sorted(utils.data_files(), key=os.path.getsize):
+            extension = path.lower()[-4:]
+            if extension not in cls.paths and not parsers.parse(path)[1]:
+                cls.paths[extension] = path
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def data(self, extension, gzipped=False):
+        with io.open(self.paths[extension], 'rb') as sufribfile:
+            data = sufribfile.read()
+        if not gzipped:
+            return data
+        gzipped_data = io.BytesIO()
+        with contextlib.closing(gzip.GzipFile(
+                fileobj=gzipped_data, mode='wb')) as gzipfile:
+            gzipfile.write(data)
+        return gzipped_data.getvalue()
+
+    def zip_archive(self, members):
+        path = os.path.join(self.tempdir, 'archive.zip')
+        with zipfile.ZipFile(path, 'w') as archive:
+            for name, data in members:
+                archive.writestr(zipfile.ZipInfo(name), data)
+        return path
+
+    def test_members(self):
+        expected = {
+            '.rib': parse(self.paths['.rib']),
+            '.rmb': parse(self.paths['.rmb']),
+            }
+        path = self.zip_archive([
+                ('a.rib', self.data('.rib')),
+                ('readme.txt', b'Niet parsen'),
+                ('b.RMB.gz', self.data('.rmb', gzipped=True)),
+                ])
+        results = parsers.parse_archive(path, workers=1)
+        self.assertEqual(
+            [name for (name, _) in results], ['a.rib', 'b.RMB.gz'])
+        for (name, (sufribobject, errors)), extension in zip(
+                results, ('.rib', '.rmb')):
+            self.assertEqual(
+                (utils.values(sufribobject), errors), expected[extension])
+
+    def test_cp437_names(self):
+        # Not flagged as UTF-8, so zipfile leaves the name as bytes in
+        # Python 2
+        path = self.zip_archive([(b'caf\x82.rib', self.data('.rib'))])
+        [(name, (sufribobject, errors))] = parsers.parse_archive(
+            path, workers=1)
+        self.assertEqual(name, 'caf\xe9.rib')
+        self.assertEqual(errors, [])
+
+    def test_corrupt_members(self):
+        data = self.data('.rib', gzipped=True)
+        corrupt = bytearray(data)
+        for i in range(len(corrupt) // 3, len(corrupt) // 2):
+            corrupt[i] ^= 0x55
+        path = self.zip_archive([
+                ('truncated.rib.gz', data[:len(data) // 2]),
+                ('corrupt.rib.gz', bytes(corrupt)),
+                ('no end.rib.gz', data[:-8]),
+                ])
+        for name, (sufribobject, errors) in parsers.parse_archive(
+                path, workers=1):
+            self.assertIs(sufribobject, None, name)
+            self.assertEqual(
+                [(error.code, error.details[0]) for error in errors],
+                [('file_error', name)])
+
+    def test_truncated_gzipped_file(self):
+        data = self.data('.rib', gzipped=True)
+        path = os.path.join(self.tempdir, 'truncated.rib.gz')
+        with io.open(path, 'wb') as gzipfile:
+            gzipfile.write(data[:-1])
+        [(name, (sufribobject, errors))] = parsers.parse_archive(path)
+        self.assertIs(sufribobject, None)
+        self.assertEqual([error.code for error in errors], ['file_error'])
@@ -0,0 +1,46 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of the sag depths of sufriblib.profiles."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import unittest
+
+import numpy as np
+
+from sufriblib import profiles
+
+
+def sag_depths(code, value):
+    """The sag depths of profiles._sag_depths(), one measurement at a
+    time."""
+    sag = np.zeros(len(value))
+    for i in range(len(value)):
+        in_sewer = code == code[i]
+        before = value[:i + 1][in_sewer[:i + 1]]
+        after = value[i:][in_sewer[i:]]
+        sag[i] = max(min(before.max(), after.max()) - value[i], 0)
+    return sag
+
+
+class TestSagDepths(unittest.TestCase):
+
+    def test_random_profiles(self):
+        rng = np.random.RandomState(1)
+        code = np.sort(rng.randint(0, 30, 600))
+        value = rng.uniform(-6, -4, 600).round(2)
+        self.assertTrue(np.array_equal(
+                profiles._sag_depths(code, value, 30),
+                sag_depths(code, value)))
+
+    def test_many_rising_sewers(self):
+        # 20,000 sewers of 50 measurements that only rise: no sags
+        code = np.repeat(np.arange(20000), 50)
+        value = (np.tile(np.arange(50) * 0.01, 20000) +
+                 np.random.RandomState(2).uniform(-6, 2, 20000)[code])
+        self.assertFalse(profiles._sag_depths(code, value, 20000).any())
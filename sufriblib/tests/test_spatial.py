@@ -0,0 +1,77 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of the spatial index against brute force."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import math
+import random
+import unittest
+
+from sufriblib import spatial
+
+
+def sewers(number, seed):
+    """Items like a sewer network: short segments in a few km."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(number):
+        x = rng.uniform(130000, 133000)
+        y = rng.uniform(450000, 453000)
+        angle = rng.uniform(0, 2 * math.pi)
+        length = rng.uniform(10, 80)
+        items.append((i, (x, y, x + length * math.cos(angle),
+                          y + length * math.sin(angle))))
+    return items
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.items = sewers(2000, 1)
+        # A sewer to a manhole with a coordinate typo, and a manhole at
+        # (0, 0)
+        self.items.append(('typo', (131000, 451000, 13100, 451000)))
+        self.items.append(('placeholder', (0, 0, 0, 0)))
+        self.index = spatial.SpatialIndex(self.items)
+
+    def distances(self, x, y):
+        return sorted(
+            (spatial._distance_to_segment(x, y, *segment), value)
+            for (value, segment) in self.items)
+
+    def test_outliers_dont_decide_the_cell_size(self):
+        self.assertAlmostEqual(
+            self.index.cell_size,
+            spatial.SpatialIndex(sewers(2000, 1)).cell_size, delta=1)
+        self.assertTrue(self.index.cell_size < 200)
+        self.assertEqual(self.index._long, [2000])
+
+    def test_queries(self):
+        rng = random.Random(2)
+        for _ in range(100):
+            x = rng.uniform(129000, 134000)
+            y = rng.uniform(449000, 454000)
+            distances = self.distances(x, y)
+            self.assertEqual(
+                sorted(self.index.within(x, y, 100), key=str),
+                sorted((value for (distance, value) in distances
+                        if distance <= 100), key=str))
+            self.assertEqual(
+                [distance for (_, distance) in self.index.nearest(x, y, 5)],
+                [distance for (distance, _) in distances[:5]])
+            box = (x, y, x + 300, y + 200)
+            self.assertEqual(
+                self.index.bbox(*box),
+                [value for (value, segment) in self.items
+                 if spatial._segment_intersects_box(*(segment + box))])
+
+    def test_nearest_far_away(self):
+        self.assertEqual(
+            [value for (value, _) in self.index.nearest(-5, -5, 2)],
+            [value for (_, value) in self.distances(-5, -5)[:2]])
@@ -0,0 +1,73 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of the counts of stats.ParseStats, which times blocks of lines
+instead of each line."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import collections
+import io
+import unittest
+
+from sufriblib import parsers
+from sufriblib import stats
+from sufriblib import sufrib
+from sufriblib.tests import utils
+
+
+def expected_counts(path, errors):
+    """Lines and lines with errors per record type, from the file."""
+    with io.open(path, 'rb') as sufribfile:
+        lines = sufribfile.read().translate(parsers._ASCII).splitlines()
+    record_types = [
+        line.partition(b'|')[0].strip().decode('ascii') for line in lines]
+    record_types = [
+        record_type if record_type in sufrib.SUFRIB21.LINE_CLASSES
+        else 'other' for record_type in record_types]
+    error_lines = set(error.line_number for error in errors)
+    return (
+        collections.Counter(record_types),
+        collections.Counter(
+            record_type for line_number, record_type in enumerate(
+                record_types, 1) if line_number in error_lines))
+
+
+class TestParseStats(unittest.TestCase):
+
+    def test_counts(self):
+        for path in utils.data_files():
+            for kwargs in ({}, {'lazy': True}):
+                parse_stats = stats.ParseStats()
+                errors = []
+                parsers.parse_collecting_errors(
+                    errors, path, stats=parse_stats, **kwargs)
+                lines, error_lines = expected_counts(path, errors)
+                record_types = parse_stats.record_types
+                self.assertEqual(
+                    dict((record_type, counts['lines'])
+                         for record_type, counts in record_types.items()),
+                    dict(lines), path)
+                self.assertEqual(
+                    dict((record_type, counts['errors'])
+                         for record_type, counts in record_types.items()
+                         if counts['errors']),
+                    dict(error_lines), path)
+                self.assertAlmostEqual(
+                    sum(counts['seconds']
+                        for counts in record_types.values()),
+                    parse_stats.phases['parse'] +
+                    parse_stats.phases['errors'])
+                self.assertEqual(sum(parse_stats.errors.values()),
+                                 len(errors))
+
+    def test_hooks(self):
+        called = []
+        parse_stats = stats.ParseStats(hooks=[called.append])
+        parsers.parse(utils.data_files()[0], stats=parse_stats)
+        self.assertEqual(called, [parse_stats])
+        self.assertTrue(parse_stats.phases['total'] > 0)
@@ -0,0 +1,299 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of the code that sufrib compiles for each line class, against
+the reference implementation, RibLine.parse()."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import io
+import re
+import unittest
+
+from sufriblib import sufrib
+from sufriblib.parsers import _ASCII
+from sufriblib.tests import utils
+
+# Lines of each record type taken from each data file
+LINES_PER_TYPE = 200
+# And of those, the number of lines of each record type to mutate
+SAMPLES_PER_TYPE = 25
+
+
+def read_lines():
+    """The first LINES_PER_TYPE lines of each record type of each data
+    file, decoded like the parsers do."""
+    lines = []
+    for path in utils.data_files():
+        counts = {}
+        with io.open(path, 'rb') as sufribfile:
+            for line in sufribfile.read().splitlines():
+                record_type = line.partition(b'|')[0]
+                counts[record_type] = counts.get(record_type, 0) + 1
+                if counts[record_type] <= LINES_PER_TYPE:
+                    lines.append(line.translate(_ASCII).decode('ascii'))
+    return lines
+
+
+def reference_parse(line_class, line_number, line):
+    """Parse line with RibLine.parse(). Returns (values, errors); values
+    is None if not all fields could be parsed."""
+    line_instance = line_class()
+    errors = sufrib.RibLine.parse(line_instance, line_number, line)
+    try:
+        values = line_instance._get_values(line_instance)
+    except AttributeError:
+        values = None
+    return values, errors
+
+
+def mutations(line):
+    """Variations of a line, most of them with an error: each field blank,
+    filled with letters, with a digit, dot or minus sign in front, and
+    the line one character too short or with an extra field."""
+    fields = line.split('|')
+    for i, field in enumerate(fields):
+        for new_field in (' ' * len(field), 'x' * len(field),
+                          '9' + field[1:], '.' + field[1:], '-' + field[1:],
+                          field[:-1] + '.'):
+            yield '|'.join(fields[:i] + [new_field] + fields[i + 1:])
+    yield line[:-1]
+    yield line + '|'
+    yield line.replace(' ', '\x01', 1)
+
+
+class TestCompiledCode(unittest.TestCase):
+    """The compiled parse(), parse_correct(), validate_line(), lazy
+    classes and format_line() give the same results as RibLine.parse()."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.lines = []
+        samples = {}
+        for line_number, line in enumerate(read_lines(), 1):
+            record_type = line.partition('|')[0].strip()
+            if record_type not in sufrib.SUFRIB21.LINE_CLASSES:
+                continue
+            line_class = sufrib.SUFRIB21.LINE_CLASSES[record_type]
+            cls.lines.append((line_class, line_number, line))
+            samples.setdefault(record_type, []).append(
+                (line_class, line_number, line))
+        cls.mutated_lines = [
+            (line_class, line_number, mutated_line)
+            for lines in samples.values()
+            for (line_class, line_number, line) in lines[:SAMPLES_PER_TYPE]
+            for mutated_line in mutations(line)]
+
+    def all_lines(self):
+        return self.lines + self.mutated_lines
+
+    def test_there_are_lines_with_errors(self):
+        self.assertTrue(any(
+                reference_parse(*line)[1] for line in self.mutated_lines))
+
+    def test_parse(self):
+        for line_class, line_number, line in self.all_lines():
+            line_instance = line_class()
+            errors = line_instance.parse(line_number, line)
+            expected_values, expected_errors = reference_parse(
+                line_class, line_number, line)
+            self.assertEqual(errors, expected_errors, line)
+            if expected_values is not None:
+                self.assertEqual(
+                    line_instance._get_values(line_instance),
+                    expected_values, line)
+
+    def test_parse_correct(self):
+        for line_class, line_number, line in self.all_lines():
+            line_instance = line_class.parse_correct(line_number, line)
+            expected_values, expected_errors = reference_parse(
+                line_class, line_number, line)
+            if expected_errors:
+                self.assertIs(line_instance, None, line)
+            elif line_instance is None:
+                # Only lines with unprintable characters are left to
+                # parse() even if they're correct
+                self.assertTrue(re.search('[^ -~]', line), line)
+            else:
+                self.assertIs(type(line_instance), line_class)
+                self.assertEqual(
+                    line_instance._get_values(line_instance),
+                    expected_values, line)
+
+    def test_parse_line(self):
+        for _, line_number, line in self.all_lines():
+            line_instance, errors = sufrib.SUFRIB21.parse_line(
+                line_number, line)
+            record_type = line.partition('|')[0].strip()
+            if record_type in sufrib.SUFRIB21.LINE_CLASSES:
+                expected_errors = reference_parse(
+                    sufrib.SUFRIB21.LINE_CLASSES[record_type],
+                    line_number, line)[1]
+            else:
+                expected_errors = [sufrib.Error(
+                        line_number, code='record_type',
+                        details=(record_type,))]
+            self.assertEqual(errors, expected_errors, line)
+
+    def test_add_lines(self):
+        rib = sufrib.SUFRIB21()
+        errors = []
+        lines = [line for (_, _, line) in self.all_lines()]
+        self.assertEqual(rib.add_lines(1, lines, errors), len(lines) + 1)
+
+        expected = sufrib.SUFRIB21()
+        expected_errors = []
+        for line_number, line in enumerate(lines, 1):
+            line_instance, line_errors = expected.parse_line(
+                line_number, line)
+            if line_errors:
+                expected_errors += line_errors
+            else:
+                expected._append(line_instance, line_instance.record_type)
+        self.assertEqual(errors, expected_errors)
+        self.assertEqual(utils.values(rib), utils.values(expected))
+        for record_type in sufrib.SUFRIB21.LINE_CLASSES:
+            self.assertEqual(
+                [line.line_number for line in rib.lines_of_type(record_type)],
+                [line.line_number
+                 for line in expected.lines_of_type(record_type)])
+
+    def test_validate_line(self):
+        for line_class, line_number, line in self.all_lines():
+            if line_class.validate_line(line.encode('ascii')):
+                self.assertEqual(
+                    reference_parse(line_class, line_number, line)[1], [],
+                    line)
+
+    def test_validate_line_accepts_correct_lines(self):
+        for line_class, line_number, line in self.lines:
+            if not reference_parse(line_class, line_number, line)[1]:
+                self.assertTrue(
+                    line_class.validate_line(line.encode('ascii')), line)
+
+    def test_lazy_class(self):
+        for line_class, line_number, line in self.all_lines():
+            lazy_line = line_class.lazy_class(
+                line_number, line.encode('ascii'))
+            expected_values, expected_errors = reference_parse(
+                line_class, line_number, line)
+            if expected_errors:
+                self.assertEqual(lazy_line.validate(), expected_errors)
+            else:
+                self.assertEqual(
+                    tuple(getattr(lazy_line, name)
+                          for name in line_class._attribute_names),
+                    expected_values, line)
+                self.assertEqual(lazy_line.to_bytes(), line.encode('ascii'))
+
+    def test_format_line(self):
+        for line_class, line_number, line in self.all_lines():
+            line_instance = line_class.parse_correct(line_number, line)
+            if line_instance is None:
+                continue
+            formatted = line_instance.format_line()
+            self.assertEqual(len(formatted), len(line))
+            values, errors = reference_parse(
+                line_class, line_number, formatted)
+            self.assertEqual(errors, [])
+            self.assertEqual(
+                values, line_instance._get_values(line_instance), line)
+
+
+def blank_waar_line():
+    """A *WAAR line with only its record type filled in."""
+    return '|'.join(
+        ('*WAAR' if i == 0 else ' ' * length)
+        for i, (_, length, _) in enumerate(sufrib.WaarLine.FIELDS))
+
+
+class TestCompiledOnFirstUse(unittest.TestCase):
+
+    def test_subclass_gets_its_own_parse_correct(self):
+        class Line(sufrib.WaarLine):
+            __slots__ = ()
+
+            def check(self):
+                return [sufrib.Error(self.line_number, "Altijd fout.")]
+
+        waar = blank_waar_line()
+        self.assertIsNot(sufrib.WaarLine.parse_correct(1, waar), None)
+        self.assertIs(Line.parse_correct(1, waar), None)
+
+    def test_parse_of_its_own_is_used(self):
+        class Line(sufrib.WaarLine):
+            __slots__ = ()
+
+            def parse(self, line_number, line):
+                return [sufrib.Error(line_number, "Altijd fout.")]
+
+        waar = blank_waar_line()
+        self.assertIs(Line.parse_correct(1, waar), None)
+
+    def test_validate_line_with_check_of_its_own(self):
+        class Line(sufrib.WaarLine):
+            __slots__ = ()
+
+            def check(self):
+                return [sufrib.Error(self.line_number, "Altijd fout.")]
+
+        waar = blank_waar_line().encode('ascii')
+        self.assertTrue(sufrib.WaarLine.validate_line(waar))
+        self.assertFalse(Line.validate_line(waar))
+
+    def test_validate_line_with_parse_of_its_own(self):
+        class Line(sufrib.WaarLine):
+            __slots__ = ()
+
+            def parse(self, line_number, line):
+                return [sufrib.Error(line_number, "Altijd fout.")]
+
+        self.assertFalse(
+            Line.validate_line(blank_waar_line().encode('ascii')))
+
+
+class TestReplacedLineClass(unittest.TestCase):
+    """A line class replaced in SUFRIB21.LINE_CLASSES is used for all ways
+    of adding a line."""
+
+    def setUp(self):
+        class Line(sufrib.WaarLine):
+            __slots__ = ()
+
+            def check(self):
+                return [sufrib.Error(self.line_number, "Altijd fout.")]
+
+        self.waar_line = sufrib.SUFRIB21.LINE_CLASSES['*WAAR']
+        sufrib.SUFRIB21.LINE_CLASSES['*WAAR'] = Line
+        self.line = blank_waar_line()
+        self.expected = [sufrib.Error(1, "Altijd fout.")]
+
+    def tearDown(self):
+        sufrib.SUFRIB21.LINE_CLASSES['*WAAR'] = self.waar_line
+
+    def test_parse_line(self):
+        self.assertEqual(
+            sufrib.SUFRIB21.parse_line(1, self.line), (None, self.expected))
+
+    def test_add_line(self):
+        rib = sufrib.RIB21()
+        errors = []
+        rib.add_line(1, self.line, errors)
+        self.assertEqual(errors, self.expected)
+        self.assertEqual(rib.lines, [])
+
+    def test_add_lines(self):
+        rib = sufrib.RIB21()
+        errors = []
+        rib.add_lines(1, [self.line], errors)
+        self.assertEqual(errors, self.expected)
+        self.assertEqual(rib.lines, [])
+
+    def test_add_raw_line(self):
+        rib = sufrib.RIB21(lazy=True)
+        rib.add_raw_line(1, self.line.encode('ascii'), [])
+        self.assertEqual(rib.validate(), self.expected)
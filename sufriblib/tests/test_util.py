@@ -0,0 +1,72 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Tests of the cache of RD to WGS84 transformations."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import unittest
+
+from sufriblib import util
+
+
+class TestPointCache(unittest.TestCase):
+
+    def test_keeps_recently_used_points(self):
+        cache = util.PointCache(2)
+        cache[1] = 'a'
+        cache[2] = 'b'
+        cache[3] = 'c'
+        self.assertEqual(cache[1], 'a')
+        cache[4] = 'd'
+        self.assertTrue(1 in cache)
+        self.assertFalse(2 in cache)
+        self.assertRaises(KeyError, lambda: cache[2])
+
+    def test_is_bounded(self):
+        cache = util.PointCache(10)
+        for point in range(1000):
+            cache[point] = point
+            self.assertTrue(len(cache) <= 20)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class TestRdToWgs84Many(unittest.TestCase):
+
+    def setUp(self):
+        self.wgs84_cache = util.wgs84_cache
+        util.wgs84_cache = util.PointCache(3)
+
+    def tearDown(self):
+        util.wgs84_cache = self.wgs84_cache
+
+    def test_more_points_than_cached(self):
+        points = [(155000.0 + 100 * i, 463000.0 + 50 * i) for i in range(10)]
+        points += points[:4]
+        results = util.rd_to_wgs84_many(points)
+        self.assertTrue(len(util.wgs84_cache) <= 6)
+        util.wgs84_cache.clear()
+        self.assertEqual(
+            results, [util.rd_to_wgs84(x, y) for (x, y) in points])
+
+
+class TestProjections(unittest.TestCase):
+
+    def test_made_once(self):
+        import pyproj
+        self.assertTrue(isinstance(util.rd_projection, pyproj.Proj))
+        self.assertIs(util.rd_projection, util.rd_projection)
+        self.assertIsNot(util.rd_projection, util.wgs84_projection)
+
+    def test_transform(self):
+        import pyproj
+        x, y = 155000.0 + 1234, 463000.0 - 567
+        lon, lat = pyproj.transform(
+            util.rd_projection, util.wgs84_projection, x, y)
+        self.assertAlmostEqual(util.rd_to_wgs84(x, y)[0], lon)
+        self.assertAlmostEqual(util.rd_to_wgs84(x, y)[1], lat)
@@ -0,0 +1,41 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Helpers for the tests."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import glob
+import os
+
+# The example files in the data/ directory of the source tree
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(
+                os.path.abspath(__file__)))), 'data')
+
+
+def data_files():
+    """Paths of the RIB and RMB files in DATA_DIR."""
+    return sorted(
+        path for path in glob.glob(os.path.join(DATA_DIR, '*'))
+        if path.lower().endswith(('.rib', '.rmb')))
+
+
+def values(sufribobject):
+    """The lines of sufribobject as (class name, values) tuples, to
+    compare the results of different ways of parsing."""
+    return [(type(line).__name__, line._get_values(line))
+            for line in sufribobject.lines]
+
+
+def make_line(line_class, line_number, **values):
+    """A line object with only these fields filled in."""
+    line = line_class()
+    for fieldname, _, _ in line_class.FIELDS:
+        setattr(line, fieldname, values.get(fieldname))
+    line.line_number = line_number
+    return line
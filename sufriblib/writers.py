@@ -0,0 +1,52 @@
+# (c) Nelen & Schuurmans.  GPL licensed, see LICENSE.rst.
+# -*- coding: utf-8 -*-
+
+"""Writing RIB and RMB files, the inverse of sufriblib.parsers."""
+
+# Python 3 is coming
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+# SUFRIB files have DOS line endings
+NEWLINE = b'\r\n'
+
+# Lines are written to the file in batches of this many lines, so that
+# there are few write calls but the whole file is never in memory.
+BATCH_SIZE = 10000
+
+
+def write(sufribobject, path, newline=NEWLINE):
+    """Write the lines of a RIB21 or RMB21 object to the file at path, see
+    write_to(). May raise IOError."""
+    with open(path, 'wb') as sufribfile:
+        write_to(sufribobject, sufribfile, newline)
+
+
+def write_to(sufribobject, sufribfile, newline=NEWLINE):
+    """Write the lines of a RIB21 or RMB21 object to sufribfile, a file
+    object opened in binary mode, each followed by newline.
+
+    Lines that were parsed lazily (parse(path, lazy=True)) are written
+    exactly as they were read, except for fields that were changed since,
+    so a file that is parsed lazily and written again comes out the same
+    (lines with an unknown record type aren't kept by the parser, so
+    those are lost). Other lines are formatted from their values, see
+    sufrib.compile_formatter(); their text fields come out as they were
+    read, numbers and coordinates in a standard way.
+
+    Raises ValueError if a value doesn't fit in its field, or if *MRIO
+    lines were parsed with columnar=True (those keep only some of their
+    fields)."""
+    columns = getattr(sufribobject, 'columns', None)
+    if columns is not None and len(columns):
+        raise ValueError(
+            "*MRIO regels die kolomsgewijs zijn ingelezen kunnen niet "
+            "worden weggeschreven.")
+
+    lines = sufribobject.lines
+    for start in range(0, len(lines), BATCH_SIZE):
+        batch = [line.to_bytes() for line in lines[start:start + BATCH_SIZE]]
+        batch.append(b'')  # For the newline after the last line
+        sufribfile.write(newline.join(batch))